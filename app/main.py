@@ -1,44 +1,58 @@
 from __future__ import annotations
 
-import base64
+import asyncio
+import multiprocessing
 import os
 import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import Optional
+from typing import Any, BinaryIO, Callable, Optional
 from urllib.parse import quote
 from uuid import uuid4
 
 from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
-from fastapi.responses import HTMLResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from dotenv import load_dotenv, set_key
+from dotenv import load_dotenv
+import httpx
+import jinja2
+import orjson
+from starlette.background import BackgroundTask
 
 from app.ppt_merge import merge_with_template
-from app.ppt_import import process_ppt_import
+from app.ppt_import import Chapter, process_ppt_import
 from app.ppt_research import append_research_slides
 from app.research import (
     ResearchResult,
     SectionResult,
+    current_config as current_research_config,
     get_deepseek_logs,
     parse_visit_requirements,
+    reload_config as reload_research_config,
     research_industry_and_customer,
 )
 from app.storage import (
+    build_chapter_word_bytes,
     delete_chapter,
     delete_job,
     delete_unified_template,
-    get_active_unified_template_blob,
     get_active_unified_template_meta,
-    get_chapter_file_blob,
+    get_chapter_file_blobs,
     get_db_info,
     get_job_detail,
-    get_job_zip_blob,
     get_unified_template_blob_by_id,
+    get_unified_template_meta,
     init_db,
     list_unified_templates,
     list_session_records,
     list_import_jobs,
+    open_chapter_file_stream,
+    open_job_zip_stream,
     set_active_unified_template,
     save_unified_template,
     save_session_record,
@@ -49,9 +63,65 @@ from app.storage import (
 ROOT_DIR = Path(__file__).resolve().parents[1]
 ENV_PATH = ROOT_DIR / ".env"
 load_dotenv(dotenv_path=ENV_PATH)
-
-app = FastAPI(title="PPT Merge Agent", version="1.0.0")
-templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
+# app.research 在导入时已缓存一份配置，需在 .env 加载后刷新
+reload_research_config()
+
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+_PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+_KEY_MASK = "*" * 256
+# .pptx 本质是 ZIP 包，本地文件头以该魔数开头
+_ZIP_MAGIC = b"PK\x03\x04"
+_ENV_KEY_RE = re.compile(r"^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*=")
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|]+')
+# 每个 worker 进程独立的临时根目录：请求只在其下创建 uuid 子目录，响应发送后由后台任务清理
+_SCRATCH_ROOT = Path(tempfile.gettempdir()) / f"ppt_agent_{os.getpid()}"
+# 模板缓存同样按进程隔离，避免不同进程/数据库之间的模板 id 串用
+_TEMPLATE_CACHE_DIR = _SCRATCH_ROOT / "templates"
+
+# python-pptx 的合并/生成是纯 CPU 计算，放到独立进程中执行，避免占住事件循环和 GIL。
+# 每个 spawn 进程都会单独加载 python-pptx，常驻内存约数十 MB，默认最多 2 个以适配 512MB 的免费实例；
+# 内存充裕的机器可用 PPT_PROCESS_WORKERS 调大（如设为 CPU 核数），设为 0 时改用线程池。
+_PPT_POOL: Optional[ProcessPoolExecutor] = None
+_PPT_PROCESS_WORKERS = int(os.getenv("PPT_PROCESS_WORKERS", "").strip() or min(2, os.cpu_count() or 1))
+# 连通性测试共用的异步 HTTP 客户端，复用 TCP/TLS 连接
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+_HTTP_CONNECT_TIMEOUT_SECONDS = 5.0
+
+
+class ORJSONResponse(JSONResponse):
+    """使用 orjson 序列化 JSON 响应（C 实现，列表类接口编码更快）。"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    yield
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+    if _PPT_POOL is not None:
+        _PPT_POOL.shutdown(wait=False)
+    shutil.rmtree(_SCRATCH_ROOT, ignore_errors=True)
+
+
+app = FastAPI(
+    title="PPT Merge Agent",
+    version="1.0.0",
+    lifespan=_lifespan,
+    default_response_class=ORJSONResponse,
+)
+# 生产环境关闭模板热加载并缓存编译后的字节码；本地开发设置 APP_ENV=development 可恢复热加载
+_DEV_MODE = os.getenv("APP_ENV", "").strip().lower() == "development"
+templates = Jinja2Templates(
+    env=jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(Path(__file__).parent / "templates")),
+        autoescape=jinja2.select_autoescape(),
+        auto_reload=_DEV_MODE,
+        bytecode_cache=None if _DEV_MODE else jinja2.FileSystemBytecodeCache(),
+    )
+)
 init_db()
 
 
@@ -97,28 +167,29 @@ async def api_deepseek_logs(limit: int = 20):
 
 @app.get("/api/settings")
 async def api_get_settings():
-    key = os.getenv("DEEPSEEK_API_KEY", "").strip()
+    # 与调研调用共用 app.research 中的同一份配置快照
+    cfg = current_research_config()
     return {
-        "has_api_key": bool(key),
-        "masked_api_key": _mask_key(key),
-        "deepseek_base_url": os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
-        "deepseek_model": os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
-        "deepseek_timeout_seconds": os.getenv("DEEPSEEK_TIMEOUT_SECONDS", "90"),
+        "has_api_key": bool(cfg.api_key),
+        "masked_api_key": _mask_key(cfg.api_key),
+        "deepseek_base_url": cfg.base_url,
+        "deepseek_model": cfg.model,
+        "deepseek_timeout_seconds": f"{cfg.timeout_seconds:g}",
     }
 
 
 @app.get("/api/db-info")
-async def api_db_info():
+def api_db_info():
     return get_db_info()
 
 
 @app.get("/api/history-sessions")
-async def api_history_sessions(limit: int = 100):
+def api_history_sessions(limit: int = 100):
     return {"items": list_session_records(limit=limit)}
 
 
 @app.post("/api/history-sessions")
-async def api_create_history_session(
+def api_create_history_session(
     raw_query: str = Form(""),
     generated_prompt: str = Form(...),
     industry: str = Form(...),
@@ -128,7 +199,7 @@ async def api_create_history_session(
     visit_role: str = Form(...),
     business_domains: str = Form(""),
 ):
-    domains = [x.strip() for x in business_domains.split(",") if x.strip()]
+    domains = _split_csv(business_domains)
     rec = save_session_record(
         raw_query=raw_query,
         generated_prompt=generated_prompt,
@@ -143,7 +214,7 @@ async def api_create_history_session(
 
 
 @app.post("/api/new-chat/parse")
-async def api_new_chat_parse(
+def api_new_chat_parse(
     query: str = Form(...),
     model: str = Form(""),
 ):
@@ -152,12 +223,12 @@ async def api_new_chat_parse(
 
 
 @app.get("/api/practice-library/jobs")
-async def api_practice_jobs(limit: int = 100):
+def api_practice_jobs(limit: int = 100):
     return {"items": list_import_jobs(limit=limit)}
 
 
 @app.get("/api/practice-library/unified-template")
-async def api_get_unified_template():
+def api_get_unified_template():
     item = get_active_unified_template_meta()
     return {"item": item}
 
@@ -169,17 +240,19 @@ async def api_upload_unified_template(template: UploadFile = File(..., descripti
     payload = await template.read()
     if not payload:
         raise HTTPException(status_code=400, detail="模板文件内容为空")
-    item = save_unified_template(filename=template.filename or "统一模板.pptx", ppt_bytes=payload)
+    if not payload.startswith(_ZIP_MAGIC):
+        raise HTTPException(status_code=400, detail="模板文件不是有效的 .pptx")
+    item = await run_in_threadpool(save_unified_template, filename=template.filename or "统一模板.pptx", ppt_bytes=payload)
     return {"ok": True, "item": item}
 
 
 @app.get("/api/practice-library/unified-templates")
-async def api_list_unified_templates(limit: int = 200):
+def api_list_unified_templates(limit: int = 200):
     return {"items": list_unified_templates(limit=limit)}
 
 
 @app.post("/api/practice-library/unified-template/{template_id}/activate")
-async def api_activate_unified_template(template_id: int):
+def api_activate_unified_template(template_id: int):
     item = set_active_unified_template(template_id)
     if not item:
         raise HTTPException(status_code=404, detail="模板不存在")
@@ -187,35 +260,38 @@ async def api_activate_unified_template(template_id: int):
 
 
 @app.delete("/api/practice-library/unified-template/{template_id}")
-async def api_delete_unified_template(template_id: int):
+def api_delete_unified_template(template_id: int):
     result = delete_unified_template(template_id)
     if not result:
         raise HTTPException(status_code=404, detail="模板不存在")
+    (_TEMPLATE_CACHE_DIR / f"template_{template_id}.pptx").unlink(missing_ok=True)
     return {"ok": True, **result}
 
 
 @app.get("/api/practice-library/unified-template/download")
-async def api_download_unified_template(template_id: int = 0):
-    result = get_unified_template_blob_by_id(template_id) if template_id > 0 else None
-    if not result:
-        active = get_active_unified_template_blob()
-        if active:
-            _, filename, payload = active
-            result = (filename, payload)
-    if not result:
+def api_download_unified_template(template_id: int = 0):
+    meta = get_unified_template_meta(template_id) if template_id > 0 else None
+    if not meta:
+        meta = get_active_unified_template_meta()
+    if not meta:
         raise HTTPException(status_code=404, detail="尚未导入统一模板")
-    filename, payload = result
-    return Response(
-        content=payload,
-        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    # 复用落盘的模板文件分块回传，不再把整个 BLOB 读进内存
+    path = _unified_template_file(int(meta["id"]))
+    if path is None:
+        raise HTTPException(status_code=404, detail="统一模板内容为空")
+    response = FileResponse(
+        path,
+        media_type=_PPTX_MEDIA_TYPE,
         headers={
-            "Content-Disposition": f"attachment; filename=\"unified_template.pptx\"; filename*=UTF-8''{quote(filename)}"
+            "Content-Disposition": _content_disposition("unified_template.pptx", str(meta["filename"]))
         },
     )
+    response.chunk_size = _DOWNLOAD_CHUNK_SIZE
+    return response
 
 
 @app.get("/api/practice-library/jobs/{job_id}")
-async def api_practice_job_detail(job_id: int):
+def api_practice_job_detail(job_id: int):
     data = get_job_detail(job_id)
     if not data:
         raise HTTPException(status_code=404, detail="记录不存在")
@@ -223,37 +299,43 @@ async def api_practice_job_detail(job_id: int):
 
 
 @app.get("/api/practice-library/jobs/{job_id}/zip")
-async def api_practice_job_zip(job_id: int):
-    result = get_job_zip_blob(job_id)
+def api_practice_job_zip(job_id: int):
+    result = open_job_zip_stream(job_id)
     if not result:
         raise HTTPException(status_code=404, detail="记录不存在")
-    filename, payload = result
-    return Response(
-        content=payload,
+    filename, size, chunks = result
+    # 从数据库分块流式回传，不把整个 ZIP 读进内存
+    return StreamingResponse(
+        chunks,
         media_type="application/zip",
         headers={
-            "Content-Disposition": f"attachment; filename=\"download.zip\"; filename*=UTF-8''{quote(filename)}"
+            "Content-Disposition": _content_disposition("download.zip", filename),
+            "Content-Length": str(size),
         },
+        # 客户端在读取前断开时响应体不会被迭代，由后台任务确定地释放 BLOB 句柄与连接
+        background=BackgroundTask(chunks.close),
     )
 
 
 @app.get("/api/practice-library/chapters/{chapter_id}/download/{file_type}")
-async def api_practice_chapter_download(chapter_id: int, file_type: str):
-    result = get_chapter_file_blob(chapter_id, file_type)
+def api_practice_chapter_download(chapter_id: int, file_type: str):
+    result = open_chapter_file_stream(chapter_id, file_type)
     if not result:
         raise HTTPException(status_code=404, detail="附件不存在")
-    filename, payload, media_type = result
-    return Response(
-        content=payload,
+    filename, size, chunks, media_type = result
+    return StreamingResponse(
+        chunks,
         media_type=media_type,
         headers={
-            "Content-Disposition": f"attachment; filename=\"download\"; filename*=UTF-8''{quote(filename)}"
+            "Content-Disposition": _content_disposition("download", filename),
+            "Content-Length": str(size),
         },
+        background=BackgroundTask(chunks.close),
     )
 
 
 @app.delete("/api/practice-library/jobs/{job_id}")
-async def api_practice_delete_job(job_id: int):
+def api_practice_delete_job(job_id: int):
     ok = delete_job(job_id)
     if not ok:
         raise HTTPException(status_code=404, detail="记录不存在")
@@ -261,7 +343,7 @@ async def api_practice_delete_job(job_id: int):
 
 
 @app.delete("/api/practice-library/chapters/{chapter_id}")
-async def api_practice_delete_chapter(chapter_id: int):
+def api_practice_delete_chapter(chapter_id: int):
     result = delete_chapter(chapter_id)
     if not result:
         raise HTTPException(status_code=404, detail="章节不存在")
@@ -269,7 +351,7 @@ async def api_practice_delete_chapter(chapter_id: int):
 
 
 @app.post("/api/settings")
-async def api_save_settings(
+def api_save_settings(
     deepseek_api_key: str = Form(""),
     deepseek_base_url: str = Form("https://api.deepseek.com"),
     deepseek_model: str = Form("deepseek-chat"),
@@ -282,17 +364,19 @@ async def api_save_settings(
     except ValueError as exc:
         raise HTTPException(status_code=400, detail="超时时间必须是大于 0 的数字") from exc
 
-    if not ENV_PATH.exists():
-        ENV_PATH.write_text("", encoding="utf-8")
-
-    set_key(str(ENV_PATH), "DEEPSEEK_BASE_URL", deepseek_base_url.strip() or "https://api.deepseek.com")
-    set_key(str(ENV_PATH), "DEEPSEEK_MODEL", deepseek_model.strip() or "deepseek-chat")
-    set_key(str(ENV_PATH), "DEEPSEEK_TIMEOUT_SECONDS", str(timeout_value))
+    updates = {
+        "DEEPSEEK_BASE_URL": deepseek_base_url.strip() or "https://api.deepseek.com",
+        "DEEPSEEK_MODEL": deepseek_model.strip() or "deepseek-chat",
+        "DEEPSEEK_TIMEOUT_SECONDS": str(timeout_value),
+    }
     if deepseek_api_key.strip():
-        set_key(str(ENV_PATH), "DEEPSEEK_API_KEY", deepseek_api_key.strip())
+        updates["DEEPSEEK_API_KEY"] = deepseek_api_key.strip()
 
-    load_dotenv(dotenv_path=ENV_PATH, override=True)
-    key = os.getenv("DEEPSEEK_API_KEY", "").strip()
+    _write_env_values(updates)
+    # 写入的值直接同步到当前进程环境，无需再整份重读 .env
+    os.environ.update(updates)
+    reload_research_config()
+    key = current_research_config().api_key
     return {"ok": True, "has_api_key": bool(key), "masked_api_key": _mask_key(key)}
 
 
@@ -302,16 +386,15 @@ async def api_test_settings_connection(
     deepseek_model: str = Form(""),
     deepseek_timeout_seconds: str = Form("90"),
 ):
-    import httpx
-
-    api_key = os.getenv("DEEPSEEK_API_KEY", "").strip()
+    settings = current_research_config()
+    api_key = settings.api_key
     if not api_key:
         raise HTTPException(status_code=400, detail="未配置 DEEPSEEK_API_KEY，请先保存 API Key。")
 
-    base_url = (deepseek_base_url or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")).strip()
-    model = (deepseek_model or os.getenv("DEEPSEEK_MODEL", "deepseek-chat")).strip()
+    base_url = (deepseek_base_url or settings.base_url).strip()
+    model = (deepseek_model or settings.model).strip()
     try:
-        timeout_s = float(deepseek_timeout_seconds or os.getenv("DEEPSEEK_TIMEOUT_SECONDS", "90"))
+        timeout_s = float(deepseek_timeout_seconds or settings.timeout_seconds)
         if timeout_s <= 0:
             raise ValueError()
     except ValueError as exc:
@@ -327,14 +410,15 @@ async def api_test_settings_connection(
         "max_tokens": 16,
     }
     try:
-        with httpx.Client(timeout=timeout_s) as client:
-            resp = client.post(
-                f"{base_url.rstrip('/')}/chat/completions",
-                headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-                json=body,
-            )
-            resp.raise_for_status()
-            data = resp.json()
+        resp = await _get_http_client().post(
+            f"{base_url.rstrip('/')}/chat/completions",
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            content=orjson.dumps(body),
+            # 建连/取连接池快速失败，读写超时沿用用户配置
+            timeout=httpx.Timeout(timeout_s, connect=_HTTP_CONNECT_TIMEOUT_SECONDS, pool=_HTTP_CONNECT_TIMEOUT_SECONDS),
+        )
+        resp.raise_for_status()
+        data = resp.json()
     except httpx.HTTPStatusError as exc:
         status_code = exc.response.status_code if exc.response else 0
         raw_text = (exc.response.text or "").strip()[:400] if exc.response else str(exc)
@@ -377,23 +461,24 @@ async def merge_ppt(
         raise HTTPException(status_code=400, detail="请至少上传一个内容 PPT 文件")
     if any(not _is_pptx(source.filename) for source in sources):
         raise HTTPException(status_code=400, detail="内容文件必须全部是 .pptx")
+    for source in sources:
+        if not await _is_valid_pptx_stream(source):
+            raise HTTPException(status_code=400, detail=f"内容文件《{source.filename}》不是有效的 .pptx")
 
-    with TemporaryDirectory() as tmp_dir:
-        tmp_path = Path(tmp_dir)
+    tmp_path = _new_scratch_dir()
+    try:
         template_path, template_source = await _resolve_template_path(
             upload_template=template,
             tmp_path=tmp_path,
         )
-        source_paths: list[Path] = []
-
-        for index, source in enumerate(sources, start=1):
-            source_path = tmp_path / f"source_{index}.pptx"
-            await _save_upload(source, source_path)
-            source_paths.append(source_path)
+        source_paths = [tmp_path / f"source_{index}.pptx" for index in range(1, len(sources) + 1)]
+        await asyncio.gather(*(_save_upload(source, path) for source, path in zip(sources, source_paths)))
 
         output_path = tmp_path / f"merged_{uuid4().hex[:8]}.pptx"
-        report = merge_with_template(template_path, source_paths, output_path)
-        data = output_path.read_bytes()
+        report = await _run_ppt_task(merge_with_template, template_path, source_paths, output_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
 
     headers = {
         "Content-Disposition": f'attachment; filename="merged_{report.imported_slides}_slides.pptx"',
@@ -401,11 +486,7 @@ async def merge_ppt(
         "X-Merge-Adjusted-Slides": str(report.layout_adjusted_slides),
         "X-Template-Source": template_source,
     }
-    return Response(
-        content=data,
-        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        headers=headers,
-    )
+    return _pptx_file_response(output_path, tmp_dir=tmp_path, headers=headers)
 
 
 @app.post("/ppt-import")
@@ -414,51 +495,32 @@ async def ppt_import(files: list[UploadFile] = File(..., description="PPTX files
         raise HTTPException(status_code=400, detail="请至少上传一个 .pptx 文件")
     if any(not _is_pptx(f.filename) for f in files):
         raise HTTPException(status_code=400, detail="仅支持 .pptx 文件")
-
-    items: list[dict] = []
-    for idx, file in enumerate(files, start=1):
-        with TemporaryDirectory() as tmp_dir:
-            tmp_path = Path(tmp_dir) / f"upload_{idx}.pptx"
-            await _save_upload(file, tmp_path)
-            try:
-                chapters, zip_bytes = process_ppt_import(tmp_path)
-            except Exception as exc:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"文件《{file.filename or f'第{idx}个文件'}》处理失败: {str(exc)[:200]}",
-                ) from exc
-
-        zip_base64 = base64.b64encode(zip_bytes).decode("utf-8") if zip_bytes else ""
-        chapters_payload = [
-            {
-                "title": c.title,
-                "content": c.content,
-                "summary": c.summary,
-                "slide_count": len(c.slide_indices),
-                "ppt_base64": c.ppt_base64,
-            }
-            for c in chapters
-        ]
-        saved = save_import_result(
-            source_filename=file.filename or f"upload_{idx}.pptx",
-            chapters=chapters_payload,
-            zip_bytes=zip_bytes,
-        )
-        db_info = get_db_info()
-        db_info.update({"saved_job_id": saved["job_id"], "saved_chapters": saved["chapter_count"]})
-        items.append(
-            {
-                "source_filename": file.filename or f"upload_{idx}.pptx",
-                "chapters": chapters_payload,
-                "zip_base64": zip_base64,
-                "db_info": db_info,
-            }
-        )
+    for file in files:
+        if not await _is_valid_pptx_stream(file):
+            raise HTTPException(status_code=400, detail=f"文件《{file.filename}》不是有效的 .pptx")
+
+    # 先并发完成所有文件的拆分（不写库），任一文件失败则整批不入库
+    prepared = await asyncio.gather(
+        *(_prepare_import_file(idx, file) for idx, file in enumerate(files, start=1)),
+        return_exceptions=True,
+    )
+    for result in prepared:
+        if isinstance(result, BaseException):
+            raise result
+    # 按上传顺序逐个写库，job id 与上传顺序一致
+    items = [
+        await _save_import_file(idx, file, *result)
+        for idx, (file, result) in enumerate(zip(files, prepared), start=1)
+    ]
+    # 所有文件入库完成后只统计一次数据库信息
+    db_info = await run_in_threadpool(get_db_info)
+    for item in items:
+        item["db_info"] = {**db_info, **item["db_info"]}
 
     # 兼容旧前端：当仅单文件时保留原字段
     if len(items) == 1:
         one = items[0]
-        return {"items": items, "chapters": one["chapters"], "zip_base64": one["zip_base64"], "db_info": one["db_info"]}
+        return {"items": items, "chapters": one["chapters"], "zip_url": one["zip_url"], "db_info": one["db_info"]}
     return {"items": items}
 
 
@@ -474,35 +536,31 @@ async def search_fill(
     if not customer.strip():
         raise HTTPException(status_code=400, detail="请输入客户")
 
-    with TemporaryDirectory() as tmp_dir:
-        tmp_path = Path(tmp_dir)
-        template_path, template_source = await _resolve_template_path(
+    tmp_path = _new_scratch_dir()
+    research_task: Optional["asyncio.Future[ResearchResult]"] = None
+    try:
+        # 先做廉价的模板校验，模板无效时不产生大模型调用；校验通过即发起调研，模板落盘与之并行
+        active_template = await _check_template_source(template)
+        research_task = _start_research(industry.strip(), customer.strip(), model)
+        template_path, template_source = await _materialize_template(
             upload_template=template,
+            active=active_template,
             tmp_path=tmp_path,
         )
-
-        try:
-            research = research_industry_and_customer(
-                industry.strip(),
-                customer.strip(),
-                model_override=model,
-            )
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        research = await _await_research(research_task)
         output_path = tmp_path / f"search_fill_{uuid4().hex[:8]}.pptx"
-        append_research_slides(template_path, output_path, research)
-        data = output_path.read_bytes()
+        await _run_ppt_task(append_research_slides, template_path, output_path, research)
+    except BaseException:
+        _cancel_research(research_task)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
 
     safe_name = f"search_fill_{industry.strip()}_{customer.strip()}.pptx"
     headers = {
-        "Content-Disposition": f"attachment; filename=\"search_fill_output.pptx\"; filename*=UTF-8''{quote(safe_name)}",
+        "Content-Disposition": _content_disposition("search_fill_output.pptx", safe_name),
         "X-Template-Source": template_source,
     }
-    return Response(
-        content=data,
-        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        headers=headers,
-    )
+    return _pptx_file_response(output_path, tmp_dir=tmp_path, headers=headers)
 
 
 @app.post("/api/generate-visit-ppt")
@@ -524,57 +582,53 @@ async def api_generate_visit_ppt(
     if not visit_role.strip():
         raise HTTPException(status_code=400, detail="请输入拜访角色")
 
-    domains = [x.strip() for x in business_domains.split(",") if x.strip()]
+    domains = _split_csv(business_domains)
     selected_ids: list[int] = []
-    if match_ids.strip():
-        for raw in match_ids.split(","):
-            raw = raw.strip()
-            if not raw:
-                continue
-            try:
-                selected_ids.append(int(raw))
-            except ValueError:
-                continue
-
-    with TemporaryDirectory() as tmp_dir:
-        tmp_path = Path(tmp_dir)
-        base_template_path, template_source = await _resolve_template_path(upload_template=None, tmp_path=tmp_path)
-
+    for raw in _split_csv(match_ids):
         try:
-            research = research_industry_and_customer(
-                industry.strip(),
-                customer.strip(),
-                model_override=model,
-            )
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail=str(exc)) from exc
-        research = _compact_research_result(research)
+            selected_ids.append(int(raw))
+        except ValueError:
+            continue
 
-        researched_path = tmp_path / "visit_research_base.pptx"
-        append_research_slides(base_template_path, researched_path, research)
+    tmp_path = _new_scratch_dir()
+    research_task: Optional["asyncio.Future[ResearchResult]"] = None
+    try:
+        # 模板校验通过后才发起调研，调研与模板落盘、方案匹配并行
+        active_template = await _check_template_source(None)
+        research_task = _start_research(industry.strip(), customer.strip(), model)
+        base_template_path, template_source = await _materialize_template(
+            upload_template=None, active=active_template, tmp_path=tmp_path
+        )
 
-        matches = _resolve_visit_matches(
+        matches = await run_in_threadpool(
+            _resolve_visit_matches,
             selected_ids=selected_ids,
             product_name=product_name.strip(),
             business_domains=domains,
             visit_role=visit_role.strip(),
         )
-        source_paths: list[Path] = []
-        for idx, item in enumerate(matches, start=1):
-            source_path = tmp_path / f"matched_{idx}.pptx"
-            source_path.write_bytes(item["ppt_blob"])
-            source_paths.append(source_path)
+        source_paths = [tmp_path / f"matched_{idx}.pptx" for idx in range(1, len(matches) + 1)]
+        await asyncio.gather(
+            *(run_in_threadpool(path.write_bytes, item["ppt_blob"]) for path, item in zip(source_paths, matches))
+        )
+
+        research = _compact_research_result(await _await_research(research_task))
+        researched_path = tmp_path / "visit_research_base.pptx"
+        await _run_ppt_task(append_research_slides, base_template_path, researched_path, research)
 
         output_path = tmp_path / f"visit_ppt_{uuid4().hex[:8]}.pptx"
-        report = merge_with_template(researched_path, source_paths, output_path)
-        payload = output_path.read_bytes()
+        report = await _run_ppt_task(merge_with_template, researched_path, source_paths, output_path)
+    except BaseException:
+        _cancel_research(research_task)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
 
     safe_name = _safe_filename(f"拜访方案_{industry}_{customer}_{product_name}.pptx")
-    return Response(
-        content=payload,
-        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    return _pptx_file_response(
+        output_path,
+        tmp_dir=tmp_path,
         headers={
-            "Content-Disposition": f"attachment; filename=\"visit_plan.pptx\"; filename*=UTF-8''{quote(safe_name)}",
+            "Content-Disposition": _content_disposition("visit_plan.pptx", safe_name),
             "X-Template-Source": template_source,
             "X-Matched-PPT-Count": str(len(matches)),
             "X-Merge-Imported-Slides": str(report.imported_slides),
@@ -583,17 +637,18 @@ async def api_generate_visit_ppt(
 
 
 @app.post("/api/generate-visit-ppt/preview")
-async def api_generate_visit_ppt_preview(
+def api_generate_visit_ppt_preview(
     product_name: str = Form(...),
     business_domains: str = Form(""),
     visit_role: str = Form(...),
 ):
-    domains = [x.strip() for x in business_domains.split(",") if x.strip()]
+    domains = _split_csv(business_domains)
     matches = search_top_chapter_ppts(
         product_name=product_name.strip(),
         business_domains=domains,
         visit_role=visit_role.strip(),
         limit=3,
+        include_blob=False,
     )
     items = [
         {
@@ -607,56 +662,317 @@ async def api_generate_visit_ppt_preview(
     return {"ok": True, "items": items}
 
 
+def _write_env_values(updates: dict[str, str]) -> None:
+    """一次性改写 .env：已有键原位替换、缺失键追加，其余行与注释保持不变；先写临时文件再原子替换。"""
+    pending = dict(updates)
+    lines = ENV_PATH.read_text(encoding="utf-8").splitlines() if ENV_PATH.exists() else []
+    out: list[str] = []
+    for line in lines:
+        match = _ENV_KEY_RE.match(line)
+        key = match.group(1) if match else None
+        if key in updates:
+            # 同一键重复出现时只保留第一处
+            if key in pending:
+                out.append(_env_line(key, pending.pop(key)))
+            continue
+        out.append(line)
+    out.extend(_env_line(key, value) for key, value in pending.items())
+
+    # .env 含 API Key：临时文件以 0600 创建，替换前沿用原文件权限，避免原子替换后变成默认 umask 的权限
+    mode = ENV_PATH.stat().st_mode & 0o7777 if ENV_PATH.exists() else 0o600
+    partial = ENV_PATH.with_name(f"{ENV_PATH.name}.{uuid4().hex[:8]}.tmp")
+    try:
+        fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(out) + "\n")
+        os.chmod(partial, mode)
+        os.replace(partial, ENV_PATH)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+
+def _env_line(key: str, value: str) -> str:
+    # 与 python-dotenv set_key 默认的单引号写法一致
+    escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+    return f"{key}='{escaped}'"
+
+
+def _get_ppt_pool() -> ProcessPoolExecutor:
+    global _PPT_POOL
+    if _PPT_POOL is None:
+        # spawn 启动方式：不继承父进程的事件循环与线程状态
+        _PPT_POOL = ProcessPoolExecutor(
+            max_workers=_PPT_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _PPT_POOL
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(90.0, connect=_HTTP_CONNECT_TIMEOUT_SECONDS, pool=_HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=15.0),
+        )
+    return _HTTP_CLIENT
+
+
+async def _run_ppt_task(func: Callable[..., Any], *args: Any) -> Any:
+    if _PPT_PROCESS_WORKERS <= 0:
+        return await run_in_threadpool(func, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_ppt_pool(), func, *args)
+
+
+def _new_scratch_dir() -> Path:
+    path = _SCRATCH_ROOT / uuid4().hex
+    path.mkdir(parents=True)
+    return path
+
+
+def _pptx_file_response(path: Path, *, tmp_dir: Path, headers: dict[str, str]) -> FileResponse:
+    """直接从磁盘回传生成的 PPT，响应发送完毕后再清理临时目录。"""
+    response = FileResponse(
+        path,
+        media_type=_PPTX_MEDIA_TYPE,
+        headers=headers,
+        background=BackgroundTask(shutil.rmtree, tmp_dir, ignore_errors=True),
+    )
+    response.chunk_size = _DOWNLOAD_CHUNK_SIZE
+    return response
+
+
 def _is_pptx(filename: str | None) -> bool:
     return bool(filename and filename.lower().endswith(".pptx"))
 
 
+async def _is_valid_pptx_stream(upload_file: UploadFile) -> bool:
+    """只读取文件头 4 字节校验 ZIP 魔数，非法文件不进入 python-pptx 解析。"""
+    head = await upload_file.read(4)
+    await upload_file.seek(0)
+    return head == _ZIP_MAGIC
+
+
 async def _save_upload(upload_file: UploadFile, destination: Path) -> None:
-    payload = await upload_file.read()
-    destination.write_bytes(payload)
+    """整段拷贝放到线程池执行：按固定块大小写盘，既不整份读入内存，也不逐块往返事件循环。"""
+    await run_in_threadpool(_copy_upload, upload_file.file, destination)
+
+
+def _copy_upload(source: BinaryIO, destination: Path) -> None:
+    with destination.open("wb") as f:
+        # 大文件已被 Starlette 的 SpooledTemporaryFile 落盘，直接用 sendfile 在内核内拷贝，
+        # 不再经过用户态缓冲区；内存中的小文件或不支持 sendfile 时退回普通分块拷贝
+        rolled = isinstance(source, tempfile.SpooledTemporaryFile) and getattr(source, "_rolled", False)
+        if rolled and hasattr(os, "sendfile"):
+            start = source.tell()
+            try:
+                _sendfile_all(source, f, start)
+                return
+            except OSError:
+                f.seek(0)
+                f.truncate()
+                source.seek(start)
+        shutil.copyfileobj(source, f, _UPLOAD_CHUNK_SIZE)
+
+
+def _sendfile_all(source: BinaryIO, dest: BinaryIO, offset: int) -> None:
+    source.flush()
+    in_fd = source.fileno()
+    size = os.fstat(in_fd).st_size
+    while offset < size:
+        sent = os.sendfile(dest.fileno(), in_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+
+async def _prepare_import_file(idx: int, file: UploadFile) -> tuple[list[Chapter], bytes, list[dict[str, Any]]]:
+    """拆分单个文件并生成章节 Word 文档（不写库），返回 (chapters, zip_bytes, chapter_rows)。"""
+    tmp_path = _new_scratch_dir()
+    upload_path = tmp_path / f"upload_{idx}.pptx"
+    try:
+        await _save_upload(file, upload_path)
+        chapters, zip_bytes = await run_in_threadpool(process_ppt_import, upload_path)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=400,
+            detail=f"文件《{file.filename or f'第{idx}个文件'}》处理失败: {str(exc)[:200]}",
+        ) from exc
+    finally:
+        await run_in_threadpool(shutil.rmtree, tmp_path, True)
+
+    chapter_rows = [
+        {
+            "title": c.title,
+            "content": c.content,
+            "summary": c.summary,
+            "slide_count": len(c.slide_indices),
+        }
+        for c in chapters
+    ]
+    # 写库前在线程池中生成各章节 Word 文档，写库事务只负责插入。
+    # 单章约几十毫秒，逐章提交到 spawn 进程池的序列化与调度开销与之相当，故不走进程池
+    word_blobs = await run_in_threadpool(_build_word_blobs, chapter_rows)
+    for row, c, word_bytes in zip(chapter_rows, chapters, word_blobs):
+        row["ppt_bytes"] = c.ppt_bytes
+        row["word_bytes"] = word_bytes
+    return chapters, zip_bytes, chapter_rows
+
+
+def _build_word_blobs(chapter_rows: list[dict[str, Any]]) -> list[bytes]:
+    return [build_chapter_word_bytes(i, row) for i, row in enumerate(chapter_rows, start=1)]
+
+
+async def _save_import_file(
+    idx: int,
+    file: UploadFile,
+    chapters: list[Chapter],
+    zip_bytes: bytes,
+    chapter_rows: list[dict[str, Any]],
+) -> dict:
+    """将已拆分的文件写库，返回接口中该文件的条目。"""
+    saved = await run_in_threadpool(
+        save_import_result,
+        source_filename=file.filename or f"upload_{idx}.pptx",
+        chapters=chapter_rows,
+        zip_bytes=zip_bytes,
+    )
+    # 文件内容已入库，前端按需通过下载接口获取，避免在 JSON 中内联 base64
+    chapters_payload = [
+        {
+            "title": c.title,
+            "content": c.content,
+            "summary": c.summary,
+            "slide_count": len(c.slide_indices),
+            "ppt_url": f"/api/practice-library/chapters/{chapter_id}/download/ppt",
+        }
+        for c, chapter_id in zip(chapters, saved["chapter_ids"])
+    ]
+    return {
+        "source_filename": file.filename or f"upload_{idx}.pptx",
+        "chapters": chapters_payload,
+        "zip_url": f"/api/practice-library/jobs/{saved['job_id']}/zip" if zip_bytes else "",
+        "db_info": {"saved_job_id": saved["job_id"], "saved_chapters": saved["chapter_count"]},
+    }
+
+
+def _start_research(industry: str, customer: str, model: str) -> "asyncio.Future[ResearchResult]":
+    """
+    在线程池中提前发起行业/客户调研：它只是等待 DeepSeek 响应，
+    可与模板解析、方案匹配等本地步骤并行，请求耗时约为两者的较大值而非之和。
+    """
+    task = asyncio.ensure_future(
+        run_in_threadpool(research_industry_and_customer, industry, customer, model_override=model)
+    )
+    # 请求在 await 之前就失败时无人取结果，这里取走异常，避免 "exception was never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+def _cancel_research(task: Optional["asyncio.Future[ResearchResult]"]) -> None:
+    """
+    请求失败时取消尚未取用的调研任务。
+    注意：这只取消 await 的一方，线程池中已发出的 DeepSeek 请求仍会执行完毕，结果被丢弃。
+    """
+    if task is not None and not task.done():
+        task.cancel()
+
+
+async def _await_research(task: "asyncio.Future[ResearchResult]") -> ResearchResult:
+    try:
+        return await task
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 async def _resolve_template_path(*, upload_template: Optional[UploadFile], tmp_path: Path) -> tuple[Path, str]:
     """
     模板优先级：1) 本次上传模板 2) 统一模板库中的最新模板。
     """
+    active = await _check_template_source(upload_template)
+    return await _materialize_template(upload_template=upload_template, active=active, tmp_path=tmp_path)
+
+
+async def _check_template_source(upload_template: Optional[UploadFile]) -> Optional[dict[str, Any]]:
+    """
+    模板的廉价校验：上传模板只看扩展名与 ZIP 魔数，统一模板只读元数据，不落盘。
+    返回统一模板元数据；使用上传模板时返回 None。
+    """
     if upload_template and upload_template.filename:
         if not _is_pptx(upload_template.filename):
             raise HTTPException(status_code=400, detail="模板文件必须是 .pptx")
+        if not await _is_valid_pptx_stream(upload_template):
+            raise HTTPException(status_code=400, detail="上传模板不是有效的 .pptx")
+        return None
+
+    active = await run_in_threadpool(get_active_unified_template_meta)
+    if not active:
+        raise HTTPException(status_code=400, detail="未上传临时模板，且未配置统一模板。请先到方案库管理导入统一模板。")
+    if int(active.get("file_size") or 0) <= 0:
+        raise HTTPException(status_code=400, detail="统一模板内容为空，请重新导入统一模板。")
+    return active
+
+
+async def _materialize_template(
+    *, upload_template: Optional[UploadFile], active: Optional[dict[str, Any]], tmp_path: Path
+) -> tuple[Path, str]:
+    """把已通过 _check_template_source 的模板落到磁盘：上传模板写入临时目录，统一模板复用共享缓存文件。"""
+    if active is None:
         upload_path = tmp_path / "template_upload.pptx"
         await _save_upload(upload_template, upload_path)
         if upload_path.stat().st_size <= 0:
             raise HTTPException(status_code=400, detail="上传模板内容为空")
         return upload_path, "upload"
 
-    active = get_active_unified_template_blob()
-    if not active:
-        raise HTTPException(status_code=400, detail="未上传临时模板，且未配置统一模板。请先到方案库管理导入统一模板。")
-    _, _, payload = active
-    if not payload:
+    db_path = await run_in_threadpool(_unified_template_file, int(active["id"]))
+    if db_path is None:
         raise HTTPException(status_code=400, detail="统一模板内容为空，请重新导入统一模板。")
-    db_path = tmp_path / "template_unified.pptx"
-    db_path.write_bytes(payload)
     return db_path, "unified_db"
 
 
+def _unified_template_file(template_id: int) -> Optional[Path]:
+    """
+    统一模板落盘为只读共享文件，按模板 id 命名（id 自增不复用，内容不会变化），
+    后续请求直接复用，无需每次从数据库读出再写临时文件。
+    """
+    path = _TEMPLATE_CACHE_DIR / f"template_{template_id}.pptx"
+    if path.exists():
+        return path
+    result = get_unified_template_blob_by_id(template_id)
+    if not result or not result[1]:
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再原子替换，并发请求不会读到写了一半的模板
+    partial = path.with_name(f"{path.name}.{uuid4().hex[:8]}.part")
+    partial.write_bytes(result[1])
+    os.replace(partial, path)
+    return path
+
+
+@lru_cache(maxsize=1024)
+def _content_disposition(fallback_name: str, filename: str) -> str:
+    """附件下载头：ASCII 兜底文件名 + RFC 5987 编码的真实文件名（结果按文件名缓存）。"""
+    return f"attachment; filename=\"{fallback_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
 def _mask_key(key: str) -> str:
     if not key:
         return ""
+    if len(key) > len(_KEY_MASK) + 8:
+        return f"{key[:4]}{'*' * (len(key) - 8)}{key[-4:]}"
     if len(key) <= 8:
-        return "*" * len(key)
-    return f"{key[:4]}{'*' * (len(key) - 8)}{key[-4:]}"
+        return _KEY_MASK[: len(key)]
+    return f"{key[:4]}{_KEY_MASK[: len(key) - 8]}{key[-4:]}"
 
 
 def _compact_research_result(research: ResearchResult) -> ResearchResult:
     def _compact_sections(sections: list[SectionResult]) -> list[SectionResult]:
         out: list[SectionResult] = []
         for sec in sections[:3]:
-            bullets = []
-            for bullet in sec.bullets[:3]:
-                text = " ".join(str(bullet).split())
-                bullets.append(text[:90])
-            out.append(SectionResult(title=str(sec.title)[:40], bullets=bullets, sources=list(sec.sources[:2])))
+            bullets = [" ".join(str(bullet).split())[:90] for bullet in sec.bullets[:3]]
+            out.append(SectionResult(title=str(sec.title)[:40], bullets=bullets, sources=sec.sources[:2]))
         return out
 
     return ResearchResult(
@@ -667,8 +983,13 @@ def _compact_research_result(research: ResearchResult) -> ResearchResult:
     )
 
 
+def _split_csv(value: str) -> list[str]:
+    """按英文逗号拆分表单字段，每段只 strip 一次并丢弃空项。"""
+    return [token for token in (part.strip() for part in value.split(",")) if token]
+
+
 def _safe_filename(name: str) -> str:
-    cleaned = re.sub(r'[\\/:*?"<>|]+', "_", name or "").strip()
+    cleaned = _UNSAFE_FILENAME_RE.sub("_", name or "").strip()
     return cleaned or "visit_plan.pptx"
 
 
@@ -681,8 +1002,9 @@ def _resolve_visit_matches(
 ) -> list[dict[str, object]]:
     if selected_ids:
         chosen: list[dict[str, object]] = []
+        file_rows = get_chapter_file_blobs(selected_ids[:3], "ppt")
         for cid in selected_ids[:3]:
-            file_row = get_chapter_file_blob(cid, "ppt")
+            file_row = file_rows.get(cid)
             if not file_row:
                 continue
             filename, payload, _ = file_row
@@ -1,19 +1,50 @@
 """PPT 自动入库：按页提取文本、按章节拆分、生成章节 PPT"""
 from __future__ import annotations
 
-import base64
 import re
 import zipfile
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from dataclasses import dataclass, field
+from functools import cached_property
 from io import BytesIO
 from pathlib import Path
-from tempfile import TemporaryDirectory
 
 from pptx import Presentation
+from pptx.oxml.ns import qn
 
-from app.ppt_merge import _copy_slide_content, _pick_blank_layout
+from app.ppt_merge import DEFAULT_TEMPLATE_KEY, _copy_slide_content, _pick_blank_layout
 from app.research import summarize_chapter_contents
 
+_SP_TAG = qn("p:sp")
+_TX_BODY_TAG = qn("p:txBody")
+_PARAGRAPH_TAG = qn("a:p")
+_PH_PATH = f"{qn('p:nvSpPr')}/{qn('p:nvPr')}/{qn('p:ph')}"
+# 对应 PP_PLACEHOLDER 的 TITLE(1)、BODY(2)、PICTURE(18)；ph 未写 type 时默认为 obj
+_PH_TITLE_TYPES = frozenset({"title", "body", "pic"})
+
+# 章节起始页模式（模块加载时编译一次）：
+# 1) 01、02、03 等大数字（单独或后跟标题）
+# 2) 第X章、第X节、第一章、Part 1、Chapter 1、一、二、三 等
+_SECTION_NUMBER_RE = re.compile(r"^0?\d{1,2}\b")  # 01、02、1、2
+# 同一模式的多行版本：对页首几行拼成的片段做一次扫描，代替逐行 match
+_SECTION_NUMBER_LINE_RE = re.compile(r"^0?\d{1,2}\b", re.MULTILINE)
+_CHAPTER_RE = re.compile(
+    r"^(第[一二三四五六七八九十百千\d]+[章节部分]|"
+    r"第\d+[章节部分]|"
+    r"Part\s*\d+|"
+    r"Chapter\s*\d+|"
+    r"第\s*\d+\s*[章节]|"
+    r"^[一二三四五六七八九十]+[、．.]|"
+    r"^\d+[\.、．]\s*\S)",
+    re.IGNORECASE,
+)
+_CLEAN_TITLE_RE = re.compile(r"[\s\x00-\x1f]+")
+_CJK_RUN_RE = re.compile(r"[\u4e00-\u9fff]{4,}")
+_UNSAFE_TITLE_RE = re.compile(r"[^\w\s\u4e00-\u9fff-]")
+# 常见章节标题结尾（方案介绍、发展趋势、整体方案等）
+_SECTION_TITLE_SUFFIXES = ("介绍", "方案", "趋势", "发展", "概述", "总览", "布局", "蓝图")
+
 
 @dataclass
 class SlideText:
@@ -21,7 +52,16 @@ class SlideText:
     index: int  # 0-based
     title: str
     body: str
-    full_text: str
+    full_len: int  # len(full_text)，章节识别只需长度时不必拼接全文
+    title_lines: list[str]  # 标题按行拆分（已 strip、去空行），供章节识别直接使用
+    body_lines: list[str]
+
+    @cached_property
+    def full_text(self) -> str:
+        # title/body 均由 strip 过的片段拼接而成，首尾无空白
+        if self.title and self.body:
+            return f"{self.title}\n{self.body}"
+        return self.title or self.body
 
 
 @dataclass
@@ -31,26 +71,30 @@ class Chapter:
     slide_indices: list[int]  # 0-based
     content: str  # 合并的文本内容
     summary: str  # 大模型提炼摘要
-    ppt_base64: str  # 该章节 PPT 的 base64
+    ppt_bytes: bytes = field(repr=False)  # 该章节 PPT 原始字节
 
 
 def extract_slide_text(slide, index: int) -> SlideText:
-    """从单页幻灯片提取文本"""
+    """从单页幻灯片提取文本
+
+    直接遍历 spTree 下的 p:sp 元素读取文本，不构造 python-pptx 的 shape 代理对象；
+    与 shape.text 一致：段落间以换行分隔，组合/表格/图片等无文本框的元素不参与。
+    """
     title_parts = []
     body_parts = []
 
-    for shape in slide.shapes:
-        if not hasattr(shape, "text") or not shape.text:
+    for sp in slide.element.cSld.spTree.iterchildren(_SP_TAG):
+        tx_body = sp.find(_TX_BODY_TAG)
+        if tx_body is None:
             continue
-        text = shape.text.strip()
+        text = "\n".join(p.text for p in tx_body.iterchildren(_PARAGRAPH_TAG)).strip()
         if not text:
             continue
 
         # 简单启发式：标题通常在顶部，文本较短；正文在下方
-        is_placeholder = getattr(shape, "is_placeholder", False)
-        ph_type = getattr(shape.placeholder_format, "type", None) if is_placeholder else None
+        ph = sp.find(_PH_PATH)
 
-        if is_placeholder and ph_type in (1, 2, 18):  # title, centerTitle, etc
+        if ph is not None and ph.get("type", "obj") in _PH_TITLE_TYPES:
             title_parts.append(text)
         elif not title_parts and len(text) < 80:
             title_parts.append(text)
@@ -59,9 +103,18 @@ def extract_slide_text(slide, index: int) -> SlideText:
 
     title = "\n".join(title_parts) if title_parts else ""
     body = "\n".join(body_parts) if body_parts else ""
-    full = f"{title}\n{body}".strip() if title or body else ""
+    return SlideText(
+        index=index,
+        title=title,
+        body=body,
+        full_len=len(title) + len(body) + (1 if title and body else 0),
+        title_lines=_split_lines(title_parts),
+        body_lines=_split_lines(body_parts),
+    )
+
 
-    return SlideText(index=index, title=title, body=body, full_text=full)
+def _split_lines(parts: list[str]) -> list[str]:
+    return [line for line in (ln.strip() for part in parts for ln in part.split("\n")) if line]
 
 
 def extract_all_text(pres: Presentation) -> list[SlideText]:
@@ -76,114 +129,100 @@ def detect_chapter_boundaries(slides_text: list[SlideText]) -> list[tuple[int, i
     if not slides_text:
         return []
 
-    # 章节起始页模式：
-    # 1) 01、02、03 等大数字（单独或后跟标题）
-    # 2) 第X章、第X节、第一章、Part 1、Chapter 1、一、二、三 等
-    section_number_pattern = re.compile(r"^0?\d{1,2}\b")  # 01、02、1、2
-    chapter_pattern = re.compile(
-        r"^(第[一二三四五六七八九十百千\d]+[章节部分]|"
-        r"第\d+[章节部分]|"
-        r"Part\s*\d+|"
-        r"Chapter\s*\d+|"
-        r"第\s*\d+\s*[章节]|"
-        r"^[一二三四五六七八九十]+[、．.]|"
-        r"^\d+[\.、．]\s*\S)",
-        re.IGNORECASE,
-    )
-
     def _clean_title(s: str) -> str:
         if not s:
             return ""
-        s = re.sub(r"[\s\x00-\x1f]+", " ", s).strip()[:80]
+        s = _CLEAN_TITLE_RE.sub(" ", s).strip()[:80]
         return s
 
-    # 常见章节标题结尾（方案介绍、发展趋势、整体方案等）
-    section_title_suffixes = ("介绍", "方案", "趋势", "发展", "概述", "总览", "布局", "蓝图")
-
     def _is_chapter_start(st: SlideText) -> bool:
         """判断是否为章节起始页（该页+后续为一章）
         如：01/02 大数字+标题、第X章、或仅含简短标题的章节分隔页
         """
-        text = (st.title or "") + "\n" + (st.body or "")
-        lines = [ln.strip() for ln in text.split("\n") if ln.strip()]
-        first_line = lines[0] if lines else ""
-        full_len = len(st.full_text)
-        # 1) 01、02 等大数字开头（含整页仅数字的情况）
-        if section_number_pattern.match(first_line) and full_len < 500:
+        full_len = st.full_len
+        # 以下各条件都要求内容较短（最宽为 < 500），长正文页直接排除；其余按开销从低到高判断
+        if full_len >= 500:
+            return False
+        title = st.title
+        body_len = len(st.body)
+        # 1) 章节分隔页：仅含简短标题，无长正文
+        if 4 <= len(title) <= 80 and body_len < 80 and full_len < 250:
+            return True
+        # 2) 标题以常见章节词结尾（如「xxx整体方案介绍」），且内容较短
+        if full_len < 300 and body_len < 100 and title.endswith(_SECTION_TITLE_SUFFIXES):
             return True
-        # 2) 任意行以 01、02 开头（大数字可能在第二行）
-        for ln in lines[:3]:
-            if section_number_pattern.match(ln) and full_len < 500:
-                return True
-        # 3) 传统章节模式
-        if chapter_pattern.match(st.title.strip() or "") and full_len < 500:
+        # 3) 前三行任意一行以 01、02 等大数字开头（含整页仅数字、大数字在第二行的情况）
+        head = "\n".join((st.title_lines + st.body_lines)[:3])
+        if _SECTION_NUMBER_LINE_RE.search(head):
             return True
-        # 4) 章节分隔页：仅含简短标题，无长正文
-        if st.title and 4 <= len(st.title) <= 80:
-            if not st.body or len(st.body) < 80:
-                if full_len < 250:
-                    return True
-        # 5) 标题以常见章节词结尾（如「xxx整体方案介绍」），且内容较短
-        title_clean = (st.title or "").strip()
-        if title_clean and any(title_clean.endswith(s) for s in section_title_suffixes):
-            if full_len < 300 and (not st.body or len(st.body) < 100):
-                return True
-        # 6) 内容极短（8-35字）且含中文，多为章节分隔页（如仅「02」+标题）
-        if 8 <= full_len <= 35 and re.search(r"[\u4e00-\u9fff]{4,}", st.full_text):
+        # 4) 传统章节模式
+        if _CHAPTER_RE.match(title):
             return True
-        return False
+        # 5) 内容极短（8-35字）且含中文，多为章节分隔页（如仅「02」+标题）
+        return 8 <= full_len <= 35 and _CJK_RUN_RE.search(st.full_text) is not None
 
     def _extract_chapter_title(st: SlideText) -> str:
         """从章节起始页提取标题（去掉纯数字行，取有意义的标题）"""
-        lines = (st.title or "").split("\n") + (st.body or "").split("\n")
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            if section_number_pattern.match(line) and len(line) <= 3:
+        for line in chain(st.title_lines, st.body_lines):
+            if _SECTION_NUMBER_RE.match(line) and len(line) <= 3:
                 continue  # 跳过纯 "01"、"02"
             if len(line) > 2 and not line.isdigit():
                 return _clean_title(line)
         return _clean_title(st.title or st.full_text) or "未命名章节"
 
-    chapters: list[tuple[int, int, str]] = []
-    current_start = 0
-    current_title = _extract_chapter_title(slides_text[0])
-
-    for i, st in enumerate(slides_text):
-        if _is_chapter_start(st):
-            if i > current_start:
-                chapters.append((current_start, i, current_title))
-            current_start = i
-            current_title = _extract_chapter_title(st)
-
-    chapters.append((current_start, len(slides_text), current_title))
-    return chapters
+    # 先一次性算出各章起始页（第 0 页总是起始页，无需判断），再按相邻起始页切分；
+    # 标题只对起始页提取一次
+    starts = [0, *(i for i in range(1, len(slides_text)) if _is_chapter_start(slides_text[i]))]
+    ends = starts[1:] + [len(slides_text)]
+    return [(start, end, _extract_chapter_title(slides_text[start])) for start, end in zip(starts, ends)]
 
 
 def create_chapter_ppt(
-    source_path: Path,
+    source: Presentation,
     slide_indices: list[int],
     output_path: Path,
 ) -> None:
-    """从源 PPT 中提取指定页，生成新 PPT"""
-    source = Presentation(str(source_path))
-    target_width = int(source.slide_width)
-    target_height = int(source.slide_height)
+    """从已加载的源 PPT 中提取指定页，生成新 PPT（源文件只解析一次，供所有章节复用）"""
+    _build_chapter_presentation(source, slide_indices).save(str(output_path))
 
-    dest = Presentation()
-    dest.slide_width = target_width
-    dest.slide_height = target_height
-    blank_layout = _pick_blank_layout(dest)
 
+def create_chapter_ppt_bytes(source: Presentation, slide_indices: list[int]) -> bytes:
+    """同 create_chapter_ppt，但直接在内存中序列化，省去写盘再读回"""
+    buf = BytesIO()
+    _build_chapter_presentation(source, slide_indices).save(buf)
+    return buf.getvalue()
+
+
+def _build_chapter_presentation(source: Presentation, slide_indices: list[int]) -> Presentation:
+    dest = Presentation()
+    dest.slide_width = source.slide_width
+    dest.slide_height = source.slide_height
+    blank_layout = _pick_blank_layout(dest, cache_key=DEFAULT_TEMPLATE_KEY)
+
+    # 按下标取页时 python-pptx 每次都会重建 sldId 列表，这里先整体展开一次
+    source_slides = list(source.slides)
+    slide_total = len(source_slides)
+    sld_id_lst = dest.slides._sldIdLst
+    next_slide_id = sld_id_lst._next_id
+    image_parts: dict = {}
     for idx in slide_indices:
-        if idx >= len(source.slides):
+        if idx >= slide_total:
             continue
-        src_slide = source.slides[idx]
-        dest_slide = dest.slides.add_slide(blank_layout)
-        _copy_slide_content(src_slide, dest_slide)
+        dest_slide = _append_slide(dest, sld_id_lst, blank_layout, next_slide_id)
+        next_slide_id += 1
+        _copy_slide_content(source_slides[idx], dest_slide, image_parts=image_parts)
 
-    dest.save(str(output_path))
+    return dest
+
+
+def _append_slide(dest: Presentation, sld_id_lst, layout, slide_id: int):
+    """等价于 dest.slides.add_slide(layout)，但 slide id 由调用方递增维护，
+    避免每加一页都用 XPath 扫描全部 sldId 求最大值（整份 deck 为 O(N²)）。
+    """
+    r_id, slide = dest.part.add_slide(layout)
+    slide.shapes.clone_layout_placeholders(layout)
+    sld_id_lst._add_sldId(id=slide_id, rId=r_id)
+    return slide
 
 
 def process_ppt_import(source_path: Path) -> tuple[list[Chapter], bytes]:
@@ -197,62 +236,69 @@ def process_ppt_import(source_path: Path) -> tuple[list[Chapter], bytes]:
 
     boundaries = detect_chapter_boundaries(slides_text)
     chapter_drafts: list[dict[str, str | list[int]]] = []
-    zip_buffer = BytesIO()
 
     for i, (start, end, title) in enumerate(boundaries):
         indices = list(range(start, end))
-        content_parts = [slides_text[j].full_text for j in indices if slides_text[j].full_text]
+        content_parts = [slides_text[j].full_text for j in indices if slides_text[j].full_len]
         content = "\n\n---\n\n".join(content_parts)
         chapter_drafts.append(
             {
                 "title": title,
                 "indices": indices,
                 "content": content,
-                "safe_title": re.sub(r"[^\w\s\u4e00-\u9fff-]", "_", title)[:30] or f"chapter_{i + 1}",
+                "safe_title": _UNSAFE_TITLE_RE.sub("_", title)[:30] or f"chapter_{i + 1}",
             }
         )
 
-    summaries = summarize_chapter_contents(
-        [{"title": str(item["title"]), "content": str(item["content"])} for item in chapter_drafts]
-    )
+    # 摘要是一次网络请求，放到后台线程与章节 PPT 生成（CPU）重叠执行
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        summaries_future = executor.submit(
+            summarize_chapter_contents,
+            [{"title": str(item["title"]), "content": str(item["content"])} for item in chapter_drafts],
+        )
+        # 源 PPT 对象不是线程安全的，章节 PPT 仍在当前线程逐个生成
+        chapter_ppts = [create_chapter_ppt_bytes(pres, list(item["indices"])) for item in chapter_drafts]
+        summaries = summaries_future.result()
     chapters: list[Chapter] = []
 
-    with TemporaryDirectory() as tmp_dir:
-        tmp_path = Path(tmp_dir)
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-            for i, item in enumerate(chapter_drafts):
-                title = str(item["title"])
-                indices = list(item["indices"])
-                content = str(item["content"])
-                safe_title = str(item["safe_title"])
-                chapter_base_name = f"章节{i + 1}_{safe_title}"
-                chapter_pptx = tmp_path / f"{chapter_base_name}.pptx"
-                create_chapter_ppt(source_path, indices, chapter_pptx)
-
-                ppt_bytes = chapter_pptx.read_bytes()
-                ppt_b64 = base64.b64encode(ppt_bytes).decode("utf-8")
-                chapter_summary = summaries[i] if i < len(summaries) else ""
-                chapter_md = _build_chapter_markdown(
+    zip_buffer = BytesIO()
+    # .pptx 本身已是 deflate 压缩的 zip，外层直接存储；只有 .md 文本再压缩
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as zf:
+        for i, item in enumerate(chapter_drafts):
+            title = str(item["title"])
+            indices = list(item["indices"])
+            content = str(item["content"])
+            safe_title = str(item["safe_title"])
+            chapter_base_name = f"章节{i + 1}_{safe_title}"
+            ppt_bytes = chapter_ppts[i]
+            chapter_summary = summaries[i] if i < len(summaries) else ""
+            chapter_md = _build_chapter_markdown(
+                title=title,
+                summary=chapter_summary,
+                content=content,
+                slide_count=len(indices),
+            )
+
+            zf.writestr(f"{chapter_base_name}.pptx", ppt_bytes)
+            zf.writestr(
+                f"{chapter_base_name}.md",
+                chapter_md.encode("utf-8"),
+                compress_type=zipfile.ZIP_DEFLATED,
+            )
+
+            chapters.append(
+                Chapter(
                     title=title,
-                    summary=chapter_summary,
+                    slide_indices=indices,
                     content=content,
-                    slide_count=len(indices),
+                    summary=chapter_summary,
+                    ppt_bytes=ppt_bytes,
                 )
+            )
 
-                zf.writestr(f"{chapter_base_name}.pptx", ppt_bytes)
-                zf.writestr(f"{chapter_base_name}.md", chapter_md.encode("utf-8"))
-
-                chapters.append(
-                    Chapter(
-                        title=title,
-                        slide_indices=indices,
-                        content=content,
-                        summary=chapter_summary,
-                        ppt_base64=ppt_b64,
-                    )
-                )
+    zip_bytes = zip_buffer.getvalue()
 
-    return chapters, zip_buffer.getvalue()
+    return chapters, zip_bytes
 
 
 def _build_chapter_markdown(*, title: str, summary: str, content: str, slide_count: int) -> str:
@@ -1,14 +1,65 @@
 from __future__ import annotations
 
-from copy import deepcopy
+import os
+import threading
+import weakref
+from collections import OrderedDict
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
+from typing import Callable, Optional
 
+from lxml import etree
 from pptx import Presentation
-from pptx.oxml.xmlchemy import OxmlElement
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls
 
 REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+}
+# Compiled once; lxml evaluates these in C instead of a Python-level
+# ``node.tag.endswith(...)`` check on every descendant.
+_PH_XPATH = etree.XPath(".//p:ph", namespaces=_NS)
+_SP_PR_XPATH = etree.XPath(".//p:spPr", namespaces=_NS)
+_XFRM_XPATH = etree.XPath(".//a:xfrm", namespaces=_NS)
+_RUN_PROPS_XPATH = etree.XPath(".//a:rPr | .//a:endParaRPr", namespaces=_NS)
+_SIZED_RUN_PROPS_XPATH = etree.XPath(".//a:rPr[@sz != ''] | .//a:endParaRPr[@sz != '']", namespaces=_NS)
+_A_RPR = f"{{{_NS['a']}}}rPr"
+_A_SOLID_FILL = f"{{{_NS['a']}}}solidFill"
+# Cloned onto title runs that have no colour of their own.
+_SOLID_FILL_TX1 = parse_xml(f'<a:solidFill {nsdecls("a")}><a:schemeClr val="tx1"/></a:solidFill>')
+# Every r:* attribute (r:embed, r:link, r:id, r:dm, ...) in document order.
+_REL_ATTRS_XPATH = etree.XPath("descendant-or-self::*/@r:*", namespaces={"r": REL_NS[1:-1]})
+# Own xfrm of each top-level shape on a slide: spPr for sp/pic/cxnSp, grpSpPr for
+# groups (children stay in group coordinates), p:xfrm for tables/charts.
+_SHAPE_XFRM_XPATH = etree.XPath(
+    "./p:cSld/p:spTree/*/*[self::p:spPr or self::p:grpSpPr]/a:xfrm"
+    " | ./p:cSld/p:spTree/p:graphicFrame/p:xfrm",
+    namespaces=_NS,
+)
+_SHAPE_ELEMENTS_XPATH = etree.XPath(
+    "./p:sp | ./p:grpSp | ./p:graphicFrame | ./p:cxnSp | ./p:pic | ./p:contentPart",
+    namespaces=_NS,
+)
+_P_EXT_LST = f"{{{_NS['p']}}}extLst"
+_A_OFF = f"{{{_NS['a']}}}off"
+_A_EXT = f"{{{_NS['a']}}}ext"
+_TITLE_PH_TYPES = frozenset({"title", "ctrTitle"})
+
+# Layout picks are pure functions of the template file, so remember the chosen
+# index per (path, mtime, size) instead of re-scoring every layout on each merge.
+_LAYOUT_INDEX_CACHE: "OrderedDict[tuple, int]" = OrderedDict()
+_LAYOUT_INDEX_CACHE_SIZE = 32
+# Merges may run on threadpool threads (PPT_PROCESS_WORKERS=0), so the LRU is locked.
+_LAYOUT_INDEX_CACHE_LOCK = threading.Lock()
+# (type, idx) -> placeholder element for each source layout/master part, built on
+# first lookup. Elements don't reference their part, so entries die with the deck.
+_PLACEHOLDER_INDEX: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+# python-pptx's bundled default template never changes.
+DEFAULT_TEMPLATE_KEY = ("<default>",)
 
 
 @dataclass
@@ -35,7 +86,7 @@ def merge_with_template(
     template = Presentation(str(template_path))
     target_width = int(template.slide_width)
     target_height = int(template.slide_height)
-    blank_layout = _pick_blank_layout(template)
+    blank_layout = _pick_blank_layout(template, cache_key=template_cache_key(template_path))
 
     report = MergeReport(
         total_source_files=len(source_paths),
@@ -44,20 +95,31 @@ def merge_with_template(
         layout_adjusted_slides=0,
     )
 
+    # Source image part -> destination image part, shared by every slide of the
+    # merge so a logo repeated across slides/files is hashed and added once.
+    image_parts: dict = {}
+
+    # Track the next slide id ourselves: slides.add_slide() rescans every sldId for the
+    # max on each call, which grows with the total slide count across all sources.
+    sld_id_lst = template.slides._sldIdLst
+    next_slide_id = sld_id_lst._next_id
+
     for source_path in source_paths:
         source = Presentation(str(source_path))
         report.total_source_slides += len(source.slides)
+        src_width = int(source.slide_width)
+        src_height = int(source.slide_height)
 
         for src_slide in source.slides:
-            dest_slide = template.slides.add_slide(blank_layout)
-            _clear_slide_shapes(dest_slide)
+            dest_slide = _append_empty_slide(template, sld_id_lst, blank_layout, next_slide_id)
+            next_slide_id += 1
             _disable_master_overlay(dest_slide)
-            _copy_slide_content(src_slide, dest_slide)
+            _copy_slide_content(src_slide, dest_slide, image_parts=image_parts)
 
             if _normalize_slide_layout(
                 dest_slide,
-                src_width=int(source.slide_width),
-                src_height=int(source.slide_height),
+                src_width=src_width,
+                src_height=src_height,
                 dst_width=target_width,
                 dst_height=target_height,
             ):
@@ -69,19 +131,52 @@ def merge_with_template(
     return report
 
 
-def _pick_blank_layout(pres: Presentation):
-    best_layout = pres.slide_layouts[0]
+def template_cache_key(path: str | Path) -> tuple:
+    """Identify a deck file's current contents (path, mtime, size) for caching."""
+    stat = os.stat(path)
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def cached_layout_index(cache_key: Optional[tuple], compute: Callable[[], int]) -> int:
+    """Return ``compute()``, memoised per ``cache_key`` in a small LRU."""
+    if cache_key is None:
+        return compute()
+    with _LAYOUT_INDEX_CACHE_LOCK:
+        index = _LAYOUT_INDEX_CACHE.get(cache_key)
+        if index is not None:
+            _LAYOUT_INDEX_CACHE.move_to_end(cache_key)
+            return index
+    # Computed outside the lock; a concurrent miss just computes the same value twice.
+    index = compute()
+    with _LAYOUT_INDEX_CACHE_LOCK:
+        _LAYOUT_INDEX_CACHE[cache_key] = index
+        _LAYOUT_INDEX_CACHE.move_to_end(cache_key)
+        if len(_LAYOUT_INDEX_CACHE) > _LAYOUT_INDEX_CACHE_SIZE:
+            _LAYOUT_INDEX_CACHE.popitem(last=False)
+    return index
+
+
+def _pick_blank_layout(pres: Presentation, cache_key: Optional[tuple] = None):
+    layouts = pres.slide_layouts
+    key = None if cache_key is None else ("blank", *cache_key)
+    return layouts[cached_layout_index(key, lambda: _blank_layout_index(layouts))]
+
+
+def _blank_layout_index(layouts) -> int:
+    best_index = 0
     best_score = float("inf")
 
-    for layout in pres.slide_layouts:
+    for index, layout in enumerate(layouts):
         name = (layout.name or "").lower()
-        placeholder_count = sum(1 for shape in layout.shapes if shape.is_placeholder)
-        text_count = sum(
-            1
-            for shape in layout.shapes
-            if hasattr(shape, "text") and shape.text and shape.text.strip()
-        )
-        shape_count = len(layout.shapes)
+        placeholder_count = 0
+        text_count = 0
+        shape_count = 0
+        for shape in layout.shapes:
+            shape_count += 1
+            if shape.is_placeholder:
+                placeholder_count += 1
+            if getattr(shape, "text", None) and shape.text.strip():
+                text_count += 1
 
         name_bonus = 0
         if "blank" in name or "空白" in name:
@@ -92,14 +187,21 @@ def _pick_blank_layout(pres: Presentation):
         score = placeholder_count * 100 + text_count * 10 + shape_count + name_bonus
         if score < best_score:
             best_score = score
-            best_layout = layout
+            best_index = index
+
+    return best_index
 
-    return best_layout
 
+def _copy_slide_content(src_slide, dest_slide, *, image_parts: Optional[dict] = None) -> None:
+    """Copy one source slide onto ``dest_slide``.
 
-def _copy_slide_content(src_slide, dest_slide) -> None:
+    ``image_parts`` maps source image parts to image parts already added to the
+    destination package; pass the same dict for every slide copied into one deck.
+    """
     sp_tree = dest_slide.shapes._spTree
     rel_map: dict[tuple[str, str], str] = {}
+    if image_parts is None:
+        image_parts = {}
 
     # Copy source master/layout visual artifacts first for pages that rely on
     # non-placeholder layout design (e.g. chapter cover background).
@@ -109,6 +211,7 @@ def _copy_slide_content(src_slide, dest_slide) -> None:
         dest_slide=dest_slide,
         sp_tree=sp_tree,
         rel_map=rel_map,
+        image_parts=image_parts,
         strip_placeholders=False,
         skip_placeholders=True,
     )
@@ -120,6 +223,7 @@ def _copy_slide_content(src_slide, dest_slide) -> None:
         dest_slide=dest_slide,
         sp_tree=sp_tree,
         rel_map=rel_map,
+        image_parts=image_parts,
         strip_placeholders=True,
         skip_placeholders=False,
     )
@@ -134,7 +238,7 @@ def _copy_slide_content(src_slide, dest_slide) -> None:
         dest_cSld = dest_slide.element.cSld
         if dest_cSld.bg is not None:
             dest_cSld.remove(dest_cSld.bg)
-        dest_cSld.insert(0, deepcopy(src_bg))
+        dest_cSld.insert(0, _clone_element(src_bg))
 
 
 def _copy_shapes_from_container(
@@ -144,90 +248,97 @@ def _copy_shapes_from_container(
     sp_tree,
     rel_map: dict[tuple[str, str], str],
     *,
+    image_parts: dict,
     strip_placeholders: bool,
     skip_placeholders: bool,
 ) -> None:
+    # Locate p:extLst once instead of rescanning spTree for it on every insert.
+    ext_lst = sp_tree.find(_P_EXT_LST)
+    insert = sp_tree.append if ext_lst is None else ext_lst.addprevious
+
     for shape in source_shapes:
         if skip_placeholders and getattr(shape, "is_placeholder", False):
             continue
 
-        copied = deepcopy(shape.element)
+        copied = _clone_element(shape.element)
         if strip_placeholders:
-            placeholder_type, placeholder_idx = _get_placeholder_info(copied)
-            if placeholder_type in {"title", "ctrTitle"}:
-                _materialize_placeholder_geometry(copied, source_part, placeholder_type, placeholder_idx)
-                title_size = _resolve_effective_title_size(shape, source_part, placeholder_type, placeholder_idx)
-            else:
+            # One XPath evaluation serves both the placeholder lookup and the strip.
+            ph_nodes = _PH_XPATH(copied)
+            if ph_nodes:
+                placeholder_type, placeholder_idx = ph_nodes[0].get("type"), ph_nodes[0].get("idx")
                 title_size = None
-            placeholder_type = _strip_placeholder_binding(copied)
-            if placeholder_type in {"title", "ctrTitle"}:
-                _apply_fallback_title_style(copied, title_size)
+                if placeholder_type in _TITLE_PH_TYPES:
+                    _materialize_placeholder_geometry(copied, source_part, placeholder_type, placeholder_idx)
+                    title_size = _resolve_effective_title_size(shape, source_part, placeholder_type, placeholder_idx)
+                if _strip_placeholder_binding(ph_nodes) in _TITLE_PH_TYPES:
+                    _apply_fallback_title_style(copied, title_size)
+
+        _remap_relationship_ids(copied, source_part, dest_slide, rel_map, image_parts)
+        insert(copied)
 
-        _remap_relationship_ids(copied, source_part, dest_slide, rel_map)
-        sp_tree.insert_element_before(copied, "p:extLst")
+
+def _clone_element(el):
+    """Deep-copy an lxml element.
+
+    lxml implements ``__deepcopy__`` in C (it ignores the memo), so calling it
+    directly skips ``copy.deepcopy``'s dispatch and memo-dict bookkeeping.
+    """
+    return el.__deepcopy__(None)
 
 
 def _apply_fallback_title_style(shape_el, fallback_size: str | None = None) -> None:
     """Ensure title text remains visible after detaching placeholder binding."""
     target_size = fallback_size or "2400"
-    for node in shape_el.iter():
-        if not (node.tag.endswith("}rPr") or node.tag.endswith("}endParaRPr")):
-            continue
+    for node in _RUN_PROPS_XPATH(shape_el):
         if node.get("sz") is None:
             node.set("sz", target_size)
-        if not any(child.tag.endswith("}solidFill") for child in node):
-            solid_fill = OxmlElement("a:solidFill")
-            scheme = OxmlElement("a:schemeClr")
-            scheme.set("val", "tx1")
-            solid_fill.append(scheme)
-            node.append(solid_fill)
+        if node.find(_A_SOLID_FILL) is None:
+            node.append(_clone_element(_SOLID_FILL_TX1))
 
 
 def _get_placeholder_info(shape_el) -> tuple[str | None, str | None]:
-    for node in shape_el.iter():
-        if node.tag.endswith("}ph"):
-            return node.get("type"), node.get("idx")
+    ph_nodes = _PH_XPATH(shape_el)
+    if ph_nodes:
+        return ph_nodes[0].get("type"), ph_nodes[0].get("idx")
     return None, None
 
 
 def _materialize_placeholder_geometry(shape_el, source_part, ph_type: str | None, ph_idx: str | None) -> None:
     """Copy xfrm from source layout/master placeholder when slide placeholder has no own geometry."""
-    sp_pr = shape_el.find(".//p:spPr", shape_el.nsmap)
-    if sp_pr is None:
-        return
-    if sp_pr.find(".//a:xfrm", shape_el.nsmap) is not None:
+    sp_prs = _SP_PR_XPATH(shape_el)
+    if not sp_prs or _XFRM_XPATH(sp_prs[0]):
         return
+    sp_pr = sp_prs[0]
 
     source_slide = getattr(source_part, "slide", None)
     if source_slide is None:
         return
 
-    placeholder_source = _find_placeholder_shape(source_slide.slide_layout, ph_type, ph_idx)
+    placeholder_source = _find_placeholder_element(source_slide.slide_layout, ph_type, ph_idx)
     if placeholder_source is None:
-        placeholder_source = _find_placeholder_shape(source_slide.slide_layout.slide_master, ph_type, ph_idx)
+        placeholder_source = _find_placeholder_element(source_slide.slide_layout.slide_master, ph_type, ph_idx)
     if placeholder_source is None:
         return
 
-    src_sp_pr = placeholder_source.element.find(".//p:spPr", shape_el.nsmap)
-    if src_sp_pr is None:
-        return
-    src_xfrm = src_sp_pr.find(".//a:xfrm", shape_el.nsmap)
-    if src_xfrm is None:
+    src_sp_prs = _SP_PR_XPATH(placeholder_source)
+    src_xfrms = _XFRM_XPATH(src_sp_prs[0]) if src_sp_prs else None
+    if not src_xfrms:
         return
-    sp_pr.append(deepcopy(src_xfrm))
+    sp_pr.append(_clone_element(src_xfrms[0]))
 
 
-def _find_placeholder_shape(container, ph_type: str | None, ph_idx: str | None):
-    for shape in container.shapes:
-        if not getattr(shape, "is_placeholder", False):
-            continue
-        c_type, c_idx = _get_placeholder_info(shape.element)
-        if c_type != ph_type:
-            continue
-        if (c_idx or "0") != (ph_idx or "0"):
-            continue
-        return shape
-    return None
+def _find_placeholder_element(container, ph_type: str | None, ph_idx: str | None):
+    """Element of the first placeholder in a layout/master matching (type, idx)."""
+    index = _PLACEHOLDER_INDEX.get(container.part)
+    if index is None:
+        index = {}
+        for shape in container.shapes:
+            if not getattr(shape, "is_placeholder", False):
+                continue
+            c_type, c_idx = _get_placeholder_info(shape.element)
+            index.setdefault((c_type, c_idx or "0"), shape.element)
+        _PLACEHOLDER_INDEX[container.part] = index
+    return index.get((ph_type, ph_idx or "0"))
 
 
 def _resolve_effective_title_size(
@@ -245,15 +356,15 @@ def _resolve_effective_title_size(
     if source_slide is None:
         return None
 
-    layout_ph = _find_placeholder_shape(source_slide.slide_layout, ph_type, ph_idx)
+    layout_ph = _find_placeholder_element(source_slide.slide_layout, ph_type, ph_idx)
     if layout_ph is not None:
-        size = _find_first_text_size(layout_ph.element)
+        size = _find_first_text_size(layout_ph)
         if size is not None:
             return size
 
-    master_ph = _find_placeholder_shape(source_slide.slide_layout.slide_master, ph_type, ph_idx)
+    master_ph = _find_placeholder_element(source_slide.slide_layout.slide_master, ph_type, ph_idx)
     if master_ph is not None:
-        size = _find_first_text_size(master_ph.element)
+        size = _find_first_text_size(master_ph)
         if size is not None:
             return size
 
@@ -261,87 +372,117 @@ def _resolve_effective_title_size(
 
 
 def _find_first_text_size(shape_el) -> str | None:
-    for node in shape_el.iter():
-        if node.tag.endswith("}rPr") and node.get("sz"):
-            return node.get("sz")
-    for node in shape_el.iter():
-        if node.tag.endswith("}endParaRPr") and node.get("sz"):
+    """First run size in the shape, else the first end-of-paragraph size (one pass)."""
+    fallback = None
+    for node in _SIZED_RUN_PROPS_XPATH(shape_el):
+        if node.tag == _A_RPR:
             return node.get("sz")
-    return None
+        if fallback is None:
+            fallback = node.get("sz")
+    return fallback
+
+
+def _append_empty_slide(pres: Presentation, sld_id_lst, layout, slide_id: int):
+    """Like ``pres.slides.add_slide(layout)`` followed by ``_clear_slide_shapes``.
+
+    Layout placeholders are never cloned onto the slide (they would be removed
+    right away), and ``slide_id`` is supplied by the caller.
+    """
+    r_id, slide = pres.part.add_slide(layout)
+    sld_id_lst._add_sldId(id=slide_id, rId=r_id)
+    return slide
 
 
 def _clear_slide_shapes(slide) -> None:
     """Remove all layout-provided shapes from a newly created slide."""
     sp_tree = slide.shapes._spTree
-    for shape in list(slide.shapes):
-        sp_tree.remove(shape.element)
+    # Same element set python-pptx treats as shapes, removed without building
+    # a shape proxy for each one.
+    for shape_el in _SHAPE_ELEMENTS_XPATH(sp_tree):
+        sp_tree.remove(shape_el)
 
 
 def _disable_master_overlay(slide) -> None:
     """Hide template master/layout artifacts on merged pages."""
-    slide.element.set("showMasterSp", "0")
-    slide.element.set("showMasterPhAnim", "0")
-    try:
-        slide.follow_master_background = False
-    except Exception:
-        # Some decks may not expose this setter consistently.
-        pass
+    slide_el = slide.element
+    slide_el.set("showMasterSp", "0")
+    slide_el.set("showMasterPhAnim", "0")
+    # The background comes from _copy_slide_content (the source's effective p:bg);
+    # python-pptx's follow_master_background is read-only, so there is nothing to set.
+
 
+def _strip_placeholder_binding(ph_nodes) -> str | None:
+    """Remove placeholder markers so copied shape won't inherit template placeholder style.
 
-def _strip_placeholder_binding(shape_el) -> str | None:
-    """Remove placeholder marker so copied shape won't inherit template placeholder style."""
+    ``ph_nodes`` are the shape's ``p:ph`` elements (see ``_PH_XPATH``); returns the
+    type of the last one removed.
+    """
     placeholder_type = None
-    for node in list(shape_el.iter()):
-        if node.tag.endswith("}ph"):
-            placeholder_type = node.get("type")
-            parent = node.getparent()
-            if parent is not None:
-                parent.remove(node)
+    for node in ph_nodes:
+        placeholder_type = node.get("type")
+        parent = node.getparent()
+        if parent is not None:
+            parent.remove(node)
     return placeholder_type
 
 
-def _remap_relationship_ids(shape_el, source_part, dest_slide, rel_map: dict[tuple[str, str], str]) -> None:
+def _remap_relationship_ids(
+    shape_el,
+    source_part,
+    dest_slide,
+    rel_map: dict[tuple[str, str], str],
+    image_parts: dict,
+) -> None:
     nodes_to_remove = []
+    source_partname = str(source_part.partname)
+    source_rels = source_part.rels
 
-    for node in shape_el.iter():
-        for attr_name, attr_value in list(node.attrib.items()):
-            if not attr_name.startswith(REL_NS):
-                continue
+    for attr_value in _REL_ATTRS_XPATH(shape_el):
+        node = attr_value.getparent()
+        if nodes_to_remove and nodes_to_remove[-1] is node:
+            continue
+        attr_name = attr_value.attrname
 
-            old_rid = attr_value
-            rel_key = (str(source_part.partname), old_rid)
-            if rel_key in rel_map:
-                node.set(attr_name, rel_map[rel_key])
-                continue
+        old_rid = str(attr_value)
+        rel_key = (source_partname, old_rid)
+        if rel_key in rel_map:
+            node.set(attr_name, rel_map[rel_key])
+            continue
 
-            rel = source_part.rels.get(old_rid)
-            if rel is None:
+        rel = source_rels.get(old_rid)
+        if rel is None:
+            continue
+
+        # Tags are PowerPoint metadata artifacts. Dropping them avoids
+        # duplicate package-part conflicts while keeping visual content intact.
+        if rel.reltype.endswith("/tags"):
+            nodes_to_remove.append(node)
+            continue
+
+        if rel.reltype.endswith("/image"):
+            try:
+                dest_image_part = image_parts.get(rel.target_part)
+                if dest_image_part is None:
+                    dest_image_part, new_rid = dest_slide.part.get_or_add_image_part(
+                        BytesIO(rel.target_part.blob)
+                    )
+                    image_parts[rel.target_part] = dest_image_part
+                else:
+                    new_rid = dest_slide.part.relate_to(dest_image_part, RT.IMAGE)
+                rel_map[rel_key] = new_rid
+                node.set(attr_name, new_rid)
                 continue
+            except Exception:
+                # For uncommon/legacy image encodings fallback to raw rel copy.
+                pass
+
+        if rel.is_external:
+            new_rid = dest_slide.part.rels.get_or_add_ext_rel(rel.reltype, rel.target_ref)
+        else:
+            new_rid = dest_slide.part.rels.get_or_add(rel.reltype, rel.target_part)
 
-            # Tags are PowerPoint metadata artifacts. Dropping them avoids
-            # duplicate package-part conflicts while keeping visual content intact.
-            if rel.reltype.endswith("/tags"):
-                nodes_to_remove.append(node)
-                break
-
-            if rel.reltype.endswith("/image"):
-                try:
-                    image_blob = rel.target_part.blob
-                    _, new_rid = dest_slide.part.get_or_add_image_part(BytesIO(image_blob))
-                    rel_map[rel_key] = new_rid
-                    node.set(attr_name, new_rid)
-                    continue
-                except Exception:
-                    # For uncommon/legacy image encodings fallback to raw rel copy.
-                    pass
-
-            if rel.is_external:
-                new_rid = dest_slide.part.rels.get_or_add_ext_rel(rel.reltype, rel.target_ref)
-            else:
-                new_rid = dest_slide.part.rels.get_or_add(rel.reltype, rel.target_part)
-
-            rel_map[rel_key] = new_rid
-            node.set(attr_name, new_rid)
+        rel_map[rel_key] = new_rid
+        node.set(attr_name, new_rid)
 
     for node in nodes_to_remove:
         parent = node.getparent()
@@ -362,14 +503,16 @@ def _normalize_slide_layout(
     scale_x = dst_width / src_width
     scale_y = dst_height / src_height
 
-    for shape in slide.shapes:
-        if hasattr(shape, "left"):
-            shape.left = int(shape.left * scale_x)
-        if hasattr(shape, "top"):
-            shape.top = int(shape.top * scale_y)
-        if hasattr(shape, "width"):
-            shape.width = max(1, int(shape.width * scale_x))
-        if hasattr(shape, "height"):
-            shape.height = max(1, int(shape.height * scale_y))
+    # Scale a:off/a:ext in place rather than through the shape.left/top/width/height
+    # descriptors; shapes without their own xfrm have no geometry to scale.
+    for xfrm in _SHAPE_XFRM_XPATH(slide.element):
+        off = xfrm.find(_A_OFF)
+        if off is not None:
+            off.set("x", str(int(int(off.get("x", 0)) * scale_x)))
+            off.set("y", str(int(int(off.get("y", 0)) * scale_y)))
+        ext = xfrm.find(_A_EXT)
+        if ext is not None:
+            ext.set("cx", str(max(1, int(int(ext.get("cx", 0)) * scale_x))))
+            ext.set("cy", str(max(1, int(int(ext.get("cy", 0)) * scale_y))))
 
     return True
@@ -6,6 +6,7 @@ from pptx import Presentation
 from pptx.enum.text import PP_ALIGN
 from pptx.util import Pt
 
+from app.ppt_merge import _clear_slide_shapes, cached_layout_index, template_cache_key
 from app.research import ResearchResult, SectionResult
 
 
@@ -15,7 +16,7 @@ def append_research_slides(
     research: ResearchResult,
 ) -> None:
     prs = Presentation(str(template_path))
-    layout = _pick_layout(prs)
+    layout = _pick_layout(prs, cache_key=template_cache_key(template_path))
 
     _add_research_slide(
         prs,
@@ -35,20 +36,25 @@ def append_research_slides(
     prs.save(str(output_path))
 
 
-def _pick_layout(prs: Presentation):
-    """优先使用「白色内页」版式。"""
-    for layout in prs.slide_layouts:
-        name = (layout.name or "").strip()
+def _pick_layout(prs: Presentation, cache_key: tuple | None = None):
+    """优先使用「白色内页」版式；同一模板文件的选择结果会被缓存。"""
+    layouts = prs.slide_layouts
+    key = None if cache_key is None else ("research", *cache_key)
+    return layouts[cached_layout_index(key, lambda: _research_layout_index(layouts))]
+
+
+def _research_layout_index(layouts) -> int:
+    names = [(layout.name or "").strip() for layout in layouts]
+    for index, name in enumerate(names):
         if name == "白色内页":
-            return layout
-    for layout in prs.slide_layouts:
-        name = (layout.name or "").strip()
+            return index
+    for index, name in enumerate(names):
         if "白色内页" in name:
-            return layout
-    for layout in prs.slide_layouts:
-        if "blank" in (layout.name or "").lower() or "空白" in (layout.name or ""):
-            return layout
-    return prs.slide_layouts[0]
+            return index
+    for index, name in enumerate(names):
+        if "blank" in name.lower() or "空白" in name:
+            return index
+    return 0
 
 
 def _add_research_slide(prs: Presentation, layout, title: str, subtitle: str, sections: list[SectionResult]) -> None:
@@ -115,12 +121,6 @@ def _add_research_slide(prs: Presentation, layout, title: str, subtitle: str, se
                 sp.font.size = Pt(9)
 
 
-def _clear_slide_shapes(slide) -> None:
-    sp_tree = slide.shapes._spTree
-    for shape in list(slide.shapes):
-        sp_tree.remove(shape.element)
-
-
 def _rgb(hex_color: str):
     from pptx.dml.color import RGBColor
 
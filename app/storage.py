@@ -1,37 +1,185 @@
 from __future__ import annotations
 
-import base64
+import functools
+import hashlib
+import io
 import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Iterator, Optional
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 DB_DIR = ROOT_DIR / "data"
 DB_PATH = DB_DIR / "ppt_mvp.db"
 
-
-def _connect() -> sqlite3.Connection:
+# 第二项为章节行中的内容列：PPT/Word 存的是 blob_store 的内容哈希，md 仍是行内文本
+_CHAPTER_FILE_FIELDS = {
+    "ppt": ("ppt_filename", "ppt_hash", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+    "md": ("md_filename", "md_text", "text/markdown; charset=utf-8"),
+    "word": ("word_filename", "word_hash", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+}
+_UNSAFE_NAME_RE = re.compile(r"[^\w\-\u4e00-\u9fff]+")
+_XML_UNSAFE_CHARS = dict.fromkeys(code for code in range(0x20) if code not in (0x09, 0x0A, 0x0D))
+_LOCAL = threading.local()
+_MMAP_SIZE_BYTES = 256 * 1024 * 1024
+_BLOB_CHUNK_SIZE = 1024 * 1024
+# sqlite3 按 SQL 文本缓存预编译语句（默认 128 条）；IN (?, ...) 与打分 SQL 随参数个数变化，放大以免常用语句被挤出
+_STATEMENT_CACHE_SIZE = 256
+_SCHEMA_LOCK = threading.Lock()
+_SCHEMA_READY = False
+# 库中全部表名（按名排序）及一条语句统计各表行数的 SQL：建表后由 init_db 从 sqlite_master 读出一次
+_TABLES: tuple[str, ...] = ()
+_TABLE_COUNTS_SQL = ""
+# _cached_read 的依赖占位：表示依赖库中全部表
+_ALL_TABLES = "*"
+# 只读查询结果缓存：键为 (函数名, 参数)，值为 (依赖表版本, 结果)
+_READ_CACHE: "OrderedDict[tuple, tuple[tuple[int, ...], Any]]" = OrderedDict()
+_READ_CACHE_SIZE = 512
+_READ_CACHE_LOCK = threading.Lock()
+_TABLE_VERSIONS: dict[str, int] = {}
+_EXTERNAL_VERSION = 0
+# 统一模板的文件内容在 blob_store 中：元信息直接读写入时记录的 file_size，只有取内容时才经由哈希关联
+_TEMPLATE_META_SQL = """
+    SELECT t.id, t.filename, t.created_at, t.file_size
+    FROM unified_templates t
+"""
+_TEMPLATE_BLOB_SQL = """
+    SELECT t.id, t.filename, b.data AS ppt_blob
+    FROM unified_templates t
+    LEFT JOIN blob_store b ON b.hash = t.ppt_hash
+"""
+
+
+def _open_connection() -> sqlite3.Connection:
     DB_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, cached_statements=_STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
     try:
         # 若文件是无效 SQLite（如 CI 中未拉取 LFS 对象的 pointer 文本），自动重建。
         conn.execute("PRAGMA schema_version").fetchone()
-        return conn
     except sqlite3.DatabaseError:
         conn.close()
         try:
             DB_PATH.unlink(missing_ok=True)
         except Exception:
             pass
-        rebuilt = sqlite3.connect(DB_PATH)
-        rebuilt.row_factory = sqlite3.Row
-        return rebuilt
+        conn = sqlite3.connect(DB_PATH, cached_statements=_STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+    _configure_connection(conn)
+    return conn
+
+
+def _configure_connection(conn: sqlite3.Connection) -> None:
+    # WAL 下读写互不阻塞；synchronous=NORMAL 在 WAL 模式下仍保证崩溃后一致（至多丢失最后几次提交）。
+    # 网络文件系统等不支持 WAL 时 SQLite 保持原日志模式，此时保留默认的 FULL。
+    # 锁等待沿用 sqlite3.connect 默认的 5 秒 timeout。
+    journal_mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    if str(journal_mode).lower() == "wal":
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE_BYTES}")
+
+
+def _thread_connection() -> sqlite3.Connection:
+    # sqlite3 连接默认不可跨线程使用：每个线程复用自己的一条连接，页缓存保持热态
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        conn = _open_connection()
+        _LOCAL.conn = conn
+    return conn
+
+
+def _connect() -> sqlite3.Connection:
+    """返回当前线程的复用连接；建表/加列只在进程内首次访问时执行一次。
+
+    调用方用 ``with _connect() as conn:`` 管理事务（提交/回滚），连接本身不关闭。
+    """
+    if not _SCHEMA_READY:
+        init_db()
+    return _thread_connection()
+
+
+def _commit(conn: sqlite3.Connection, *tables: str) -> None:
+    """提交事务，并让依赖这些表的读缓存失效。"""
+    conn.commit()
+    with _READ_CACHE_LOCK:
+        for table in tables:
+            _TABLE_VERSIONS[table] = _TABLE_VERSIONS.get(table, 0) + 1
+
+
+def _sync_data_version(conn: sqlite3.Connection) -> None:
+    # data_version 只在「其他连接」提交后变化：其他线程或其他进程写库时整体失效读缓存
+    global _EXTERNAL_VERSION
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if getattr(_LOCAL, "data_version", None) != version:
+        _LOCAL.data_version = version
+        with _READ_CACHE_LOCK:
+            _EXTERNAL_VERSION += 1
+
+
+def _cached_read(*tables: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """按 (函数, 参数) 缓存只读查询结果；所依赖表的版本变化后自动失效。
+
+    缓存的结果会被多次请求共享，调用方不得原地修改。
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            _sync_data_version(_connect())
+            deps = _TABLES if tables == (_ALL_TABLES,) else tables
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            with _READ_CACHE_LOCK:
+                # 版本须在查询前取得：查询期间若有写入，本次结果会以旧版本入缓存，下次读取即失效
+                versions = (_EXTERNAL_VERSION, *(_TABLE_VERSIONS.get(table, 0) for table in deps))
+                hit = _READ_CACHE.get(key)
+                if hit is not None and hit[0] == versions:
+                    _READ_CACHE.move_to_end(key)
+                    return hit[1]
+            value = func(*args, **kwargs)
+            with _READ_CACHE_LOCK:
+                _READ_CACHE[key] = (versions, value)
+                _READ_CACHE.move_to_end(key)
+                if len(_READ_CACHE) > _READ_CACHE_SIZE:
+                    _READ_CACHE.popitem(last=False)
+            return value
+
+        return wrapper
+
+    return decorator
 
 
 def init_db() -> None:
-    with _connect() as conn:
+    global _SCHEMA_READY
+    # 已初始化时无需加锁；首次初始化由锁内的二次检查保证只执行一次
+    if _SCHEMA_READY:
+        return
+    with _SCHEMA_LOCK:
+        if _SCHEMA_READY:
+            return
+        _create_schema()
+        _load_table_names()
+        _SCHEMA_READY = True
+
+
+def _load_table_names() -> None:
+    global _TABLES, _TABLE_COUNTS_SQL
+    cur = _thread_connection().execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )
+    cur.row_factory = None
+    _TABLES = tuple(name for (name,) in cur)
+    _TABLE_COUNTS_SQL = (
+        " UNION ALL ".join(f"SELECT '{name}' AS name, COUNT(*) AS c FROM \"{name}\"" for name in _TABLES)
+        + " ORDER BY name"
+    )
+
+
+def _create_schema() -> None:
+    with _thread_connection() as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS import_jobs (
@@ -102,6 +250,29 @@ def init_db() -> None:
         )
         _ensure_column(conn, "chapter_assets", "word_filename", "TEXT")
         _ensure_column(conn, "chapter_assets", "word_blob", "BLOB")
+        _ensure_column(conn, "import_jobs", "zip_dirty", "INTEGER NOT NULL DEFAULT 0")
+        _create_blob_store(conn)
+        _ensure_column(conn, "unified_templates", "file_size", "INTEGER NOT NULL DEFAULT 0")
+        _ensure_column(conn, "chapter_assets", "ppt_size", "INTEGER NOT NULL DEFAULT 0")
+        # 旧数据补齐文件大小（新写入的行在插入时即记录）
+        conn.execute(
+            """
+            UPDATE unified_templates
+            SET file_size = coalesce((SELECT length(data) FROM blob_store WHERE hash = unified_templates.ppt_hash), 0)
+            WHERE file_size = 0 AND ppt_hash IS NOT NULL
+            """
+        )
+        conn.execute(
+            """
+            UPDATE chapter_assets
+            SET ppt_size = coalesce((SELECT length(data) FROM blob_store WHERE hash = chapter_assets.ppt_hash), 0)
+            WHERE ppt_size = 0 AND ppt_hash IS NOT NULL
+            """
+        )
+        # 按 job 取章节、删除整件文件、重建 ZIP 都按 job_id 过滤并按章节序号排序
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chapter_assets_job_id_chapter_index ON chapter_assets(job_id, chapter_index)"
+        )
         conn.commit()
 
 
@@ -112,7 +283,38 @@ def save_import_result(
     zip_bytes: bytes,
     zip_filename: str = "ppt_分拆章节.zip",
 ) -> dict[str, Any]:
-    init_db()
+    # 先在事务外生成 md/docx 等行数据，缩短数据库写锁的持有时间
+    rows: list[tuple[Any, ...]] = []
+    blobs: dict[bytes, bytes] = {}
+    for idx, chapter in enumerate(chapters, start=1):
+        title, summary, content, slide_count = _chapter_fields(idx, chapter)
+        ppt_blob = chapter.get("ppt_bytes") or b""
+        # 调用方可在写库前预先生成 Word 文档，未提供时在此生成
+        word_blob = chapter.get("word_bytes")
+        if word_blob is None:
+            word_blob = _build_word_bytes(title=title, summary=summary, content=content, slide_count=slide_count)
+        ppt_hash = _blob_hash(ppt_blob)
+        word_hash = _blob_hash(word_blob)
+        blobs[ppt_hash] = ppt_blob
+        blobs[word_hash] = word_blob
+        safe_title = _safe_name(title)
+        rows.append(
+            (
+                idx,
+                title,
+                summary,
+                content,
+                slide_count,
+                f"章节{idx}_{safe_title}.pptx",
+                ppt_hash,
+                len(ppt_blob),
+                f"章节{idx}_{safe_title}.md",
+                _build_md(title=title, summary=summary, content=content, slide_count=slide_count),
+                f"章节{idx}_{safe_title}.docx",
+                word_hash,
+            )
+        )
+
     with _connect() as conn:
         cur = conn.execute(
             """
@@ -122,66 +324,40 @@ def save_import_result(
             (source_filename, len(chapters), zip_filename, sqlite3.Binary(zip_bytes)),
         )
         job_id = int(cur.lastrowid)
-
-        for idx, chapter in enumerate(chapters, start=1):
-            title = str(chapter.get("title") or f"章节{idx}")
-            summary = str(chapter.get("summary") or "")
-            content = str(chapter.get("content") or "")
-            slide_count = int(chapter.get("slide_count") or 0)
-            ppt_b64 = str(chapter.get("ppt_base64") or "")
-            ppt_blob = base64.b64decode(ppt_b64) if ppt_b64 else b""
-            safe_title = _safe_name(title)
-            ppt_filename = f"章节{idx}_{safe_title}.pptx"
-            md_filename = f"章节{idx}_{safe_title}.md"
-            word_filename = f"章节{idx}_{safe_title}.docx"
-            md_text = _build_md(title=title, summary=summary, content=content, slide_count=slide_count)
-            word_blob = _build_word_bytes(title=title, summary=summary, content=content, slide_count=slide_count)
-
-            conn.execute(
-                """
-                INSERT INTO chapter_assets (
-                    job_id, chapter_index, title, summary, content, slide_count,
-                    ppt_filename, ppt_blob, md_filename, md_text, word_filename, word_blob
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    job_id,
-                    idx,
-                    title,
-                    summary,
-                    content,
-                    slide_count,
-                    ppt_filename,
-                    sqlite3.Binary(ppt_blob),
-                    md_filename,
-                    md_text,
-                    word_filename,
-                    sqlite3.Binary(word_blob),
-                ),
+        _store_blobs(conn, blobs)
+        # 旧的 ppt_blob 列为 NOT NULL，只写入空值占位，内容通过 ppt_hash/word_hash 关联
+        conn.executemany(
+            """
+            INSERT INTO chapter_assets (
+                job_id, chapter_index, title, summary, content, slide_count,
+                ppt_filename, ppt_blob, ppt_hash, ppt_size, md_filename, md_text, word_filename, word_hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, X'', ?, ?, ?, ?, ?, ?)
+            """,
+            [(job_id, *row) for row in rows],
+        )
+        # executemany 不返回逐行 lastrowid；新任务下只有刚插入的章节，按序号取回即可
+        chapter_ids = [
+            row[0]
+            for row in conn.execute(
+                "SELECT id FROM chapter_assets WHERE job_id = ? ORDER BY chapter_index ASC", (job_id,)
             )
-
-        conn.commit()
+        ]
+        _commit(conn, "import_jobs", "chapter_assets")
 
     return {
         "job_id": job_id,
         "chapter_count": len(chapters),
+        "chapter_ids": chapter_ids,
         "zip_filename": zip_filename,
     }
 
 
+@_cached_read(_ALL_TABLES)
 def get_db_info() -> dict[str, Any]:
-    init_db()
     with _connect() as conn:
-        table_names = [
-            row["name"]
-            for row in conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
-            )
-        ]
-        tables: list[dict[str, Any]] = []
-        for name in table_names:
-            count = conn.execute(f"SELECT COUNT(*) AS c FROM {name}").fetchone()["c"]
-            tables.append({"name": name, "rows": int(count)})
+        cur = conn.execute(_TABLE_COUNTS_SQL)
+        cur.row_factory = None
+        tables = [{"name": name, "rows": count} for name, count in cur]
 
     return {
         "db_type": "SQLite",
@@ -191,10 +367,10 @@ def get_db_info() -> dict[str, Any]:
     }
 
 
+@_cached_read("import_jobs")
 def list_import_jobs(limit: int = 100) -> list[dict[str, Any]]:
-    init_db()
     with _connect() as conn:
-        rows = conn.execute(
+        cur = conn.execute(
             """
             SELECT id, source_filename, chapter_count, zip_filename, created_at
             FROM import_jobs
@@ -202,12 +378,17 @@ def list_import_jobs(limit: int = 100) -> list[dict[str, Any]]:
             LIMIT ?
             """,
             (max(1, min(limit, 500)),),
-        ).fetchall()
-    return [dict(row) for row in rows]
+        )
+        # 列表接口行数多：用普通元组按位置取值构造 dict，省去 sqlite3.Row 的按名查找与 dict(row) 转换
+        cur.row_factory = None
+        rows = cur.fetchall()
+    return [
+        {"id": r[0], "source_filename": r[1], "chapter_count": r[2], "zip_filename": r[3], "created_at": r[4]}
+        for r in rows
+    ]
 
 
 def get_job_detail(job_id: int) -> dict[str, Any] | None:
-    init_db()
     with _connect() as conn:
         job = conn.execute(
             """
@@ -232,39 +413,134 @@ def get_job_detail(job_id: int) -> dict[str, Any] | None:
 
 
 def get_job_zip_blob(job_id: int) -> tuple[str, bytes] | None:
-    init_db()
+    _ensure_job_zip(job_id)
     with _connect() as conn:
         row = conn.execute("SELECT zip_filename, zip_blob FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
     if not row:
         return None
-    return str(row["zip_filename"]), bytes(row["zip_blob"] or b"")
+    return row["zip_filename"], row["zip_blob"]
 
 
 def get_chapter_file_blob(chapter_id: int, file_type: str) -> tuple[str, bytes, str] | None:
-    init_db()
-    field_map = {
-        "ppt": ("ppt_filename", "ppt_blob", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
-        "md": ("md_filename", "md_text", "text/markdown; charset=utf-8"),
-        "word": ("word_filename", "word_blob", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
-    }
-    if file_type not in field_map:
-        return None
-    filename_col, blob_col, media_type = field_map[file_type]
+    return get_chapter_file_blobs([chapter_id], file_type).get(chapter_id)
+
+
+def get_chapter_file_blobs(chapter_ids: list[int], file_type: str) -> dict[int, tuple[str, bytes, str]]:
+    """一次查询取回多个章节的附件，返回 {chapter_id: (filename, payload, media_type)}。"""
+    if file_type not in _CHAPTER_FILE_FIELDS or not chapter_ids:
+        return {}
+    filename_col, content_col, media_type = _CHAPTER_FILE_FIELDS[file_type]
+    from_sql, payload_sql, _, _, _ = _chapter_payload_source(content_col)
+    placeholders = ", ".join("?" for _ in chapter_ids)
     with _connect() as conn:
-        row = conn.execute(
-            f"SELECT {filename_col} AS filename, {blob_col} AS payload FROM chapter_assets WHERE id = ?",
-            (chapter_id,),
-        ).fetchone()
-    if not row:
+        rows = conn.execute(
+            f"SELECT c.id, c.{filename_col} AS filename, {payload_sql} AS payload FROM {from_sql} WHERE c.id IN ({placeholders})",
+            tuple(chapter_ids),
+        ).fetchall()
+    result: dict[int, tuple[str, bytes, str]] = {}
+    for row in rows:
+        payload = row["payload"]
+        if payload is None:
+            continue
+        payload_bytes = payload.encode("utf-8") if isinstance(payload, str) else payload
+        result[row["id"]] = (str(row["filename"]), payload_bytes, media_type)
+    return result
+
+
+def open_job_zip_stream(job_id: int) -> tuple[str, int, BlobChunks] | None:
+    """按块读取任务 ZIP，返回 (filename, size, chunks)；记录不存在返回 None。"""
+    _ensure_job_zip(job_id)
+    return _open_blob_stream(
+        "SELECT zip_filename, length(zip_blob), typeof(zip_blob), id FROM import_jobs WHERE id = ?",
+        job_id,
+        "import_jobs",
+        "zip_blob",
+    )
+
+
+def open_chapter_file_stream(chapter_id: int, file_type: str) -> tuple[str, int, BlobChunks, str] | None:
+    """按块读取章节附件，返回 (filename, size, chunks, media_type)；附件不存在返回 None。"""
+    if file_type not in _CHAPTER_FILE_FIELDS:
         return None
-    payload = row["payload"]
-    if payload is None:
+    filename_col, content_col, media_type = _CHAPTER_FILE_FIELDS[file_type]
+    from_sql, payload_sql, payload_rowid_sql, blob_table, blob_col = _chapter_payload_source(content_col)
+    stream = _open_blob_stream(
+        f"SELECT c.{filename_col}, length({payload_sql}), typeof({payload_sql}), {payload_rowid_sql} FROM {from_sql} WHERE c.id = ?",
+        chapter_id,
+        blob_table,
+        blob_col,
+    )
+    if stream is None:
         return None
-    if isinstance(payload, str):
-        payload_bytes = payload.encode("utf-8")
-    else:
-        payload_bytes = bytes(payload)
-    return str(row["filename"]), payload_bytes, media_type
+    return (*stream, media_type)
+
+
+def _chapter_payload_source(content_col: str) -> tuple[str, str, str, str, str]:
+    """
+    返回章节内容列的 (FROM 子句, 内容表达式, 内容所在行的 rowid 表达式, 内容所在表, 内容列)。
+    *_hash 列指向 blob_store，其余（md_text）直接读章节行。
+    """
+    if content_col.endswith("_hash"):
+        return f"chapter_assets c LEFT JOIN blob_store b ON b.hash = c.{content_col}", "b.data", "b.rowid", "blob_store", "data"
+    return "chapter_assets c", f"c.{content_col}", "c.id", "chapter_assets", content_col
+
+
+def _open_blob_stream(select_sql: str, row_id: int, table: str, blob_col: str) -> tuple[str, int, BlobChunks] | None:
+    """
+    用增量 BLOB 句柄（Python 3.11+ 的 Connection.blobopen）分块读取，峰值内存只有一个块。
+    select_sql 需返回 (文件名, 长度, 类型, 内容所在 table 行的 rowid)。
+    响应体由线程池中的不同线程逐块迭代，因此使用独立连接（check_same_thread=False），由 BlobChunks 负责关闭。
+    更早的 Python 版本回退为一次性读出。
+    """
+    _connect()  # 确保表结构已初始化
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    try:
+        row = conn.execute(select_sql, (row_id,)).fetchone()
+        if row is None or row[2] == "null":
+            conn.close()
+            return None
+        filename, size, value_type, blob_rowid = str(row[0]), row[1], row[2], row[3]
+        # md 等 TEXT 列的 length() 是字符数而非字节数，整体读出后编码
+        if value_type == "text" or not hasattr(conn, "blobopen") or size == 0:
+            payload = conn.execute(f"SELECT {blob_col} FROM {table} WHERE rowid = ?", (blob_rowid,)).fetchone()[0]
+            conn.close()
+            data = payload.encode("utf-8") if isinstance(payload, str) else (payload if payload is not None else b"")
+            return filename, len(data), BlobChunks(io.BytesIO(data))
+        blob = conn.blobopen(table, blob_col, blob_rowid, readonly=True)
+    except BaseException:
+        conn.close()
+        raise
+    return filename, size, BlobChunks(blob, conn)
+
+
+class BlobChunks:
+    """
+    按块迭代 BLOB 句柄的响应体。读完、出错或调用 close() 时立即关闭句柄与其独立连接，close() 可重复调用。
+    客户端在开始读取前断开时响应体不会被迭代，调用方需另行调用 close()（如作为响应的后台任务）。
+    """
+
+    def __init__(self, blob: Any, conn: Optional[sqlite3.Connection] = None) -> None:
+        self._blob = blob
+        self._conn = conn
+        self._closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            while not self._closed:
+                chunk = self._blob.read(_BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._blob.close()
+        if self._conn is not None:
+            self._conn.close()
 
 
 def search_top_chapter_ppts(
@@ -273,93 +549,90 @@ def search_top_chapter_ppts(
     business_domains: list[str],
     visit_role: str,
     limit: int = 3,
+    include_blob: bool = True,
 ) -> list[dict[str, Any]]:
     """
     按产品/业务域/拜访角色在章节内容中做关键词打分，返回前 N 个章节 PPT。
+
+    include_blob=False 时不读取 ppt_blob（结果中为 b""），供只展示匹配列表的调用方使用。
     """
-    init_db()
     limit = max(1, min(limit, 20))
     product = (product_name or "").strip()
     role = (visit_role or "").strip()
     domains = [x.strip() for x in business_domains if x and x.strip()]
 
+    # 在 SQL 中用 instr 做子串打分并排序截断，只为入选章节读取 ppt_blob。
+    # 中文内容不分词，FTS5 默认分词器无法做子串匹配，因此保持逐行子串判断的语义。
+    terms: list[tuple[str, int]] = []
+    if product:
+        terms.append((product, 5))
+    if role:
+        terms.append((role, 2))
+    terms.extend((domain, 3) for domain in domains)
+    score_sql = " + ".join(f"(instr(text, ?) > 0) * {weight}" for _, weight in terms) or "0"
+
     with _connect() as conn:
         rows = conn.execute(
-            """
-            SELECT
-                c.id,
-                c.job_id,
-                c.chapter_index,
-                c.title,
-                c.summary,
-                c.content,
-                c.ppt_filename,
-                c.ppt_blob,
-                c.created_at,
-                j.source_filename
-            FROM chapter_assets c
-            LEFT JOIN import_jobs j ON j.id = c.job_id
-            ORDER BY c.id DESC
-            """
+            f"""
+            WITH candidates AS (
+                SELECT
+                    c.id,
+                    c.job_id,
+                    c.chapter_index,
+                    c.title,
+                    c.ppt_filename,
+                    c.created_at,
+                    j.source_filename,
+                    coalesce(c.title, '') || ' ' || coalesce(c.summary, '') || ' '
+                        || coalesce(c.content, '') || ' ' || coalesce(j.source_filename, '') AS text
+                FROM chapter_assets c
+                LEFT JOIN import_jobs j ON j.id = c.job_id
+                WHERE c.ppt_size > 0
+            )
+            SELECT id, job_id, chapter_index, title, ppt_filename, created_at, source_filename,
+                   {score_sql} AS score
+            FROM candidates
+            ORDER BY score DESC, id DESC
+            LIMIT ?
+            """,
+            (*(term for term, _ in terms), limit),
         ).fetchall()
-
-    scored: list[tuple[int, int, dict[str, Any]]] = []
-    for row in rows:
-        text = " ".join(
-            [
-                str(row["title"] or ""),
-                str(row["summary"] or ""),
-                str(row["content"] or ""),
-                str(row["source_filename"] or ""),
-            ]
-        )
-        score = 0
-        if product and product in text:
-            score += 5
-        if role and role in text:
-            score += 2
-        for domain in domains:
-            if domain in text:
-                score += 3
-        item = {
-            "chapter_id": int(row["id"]),
-            "job_id": int(row["job_id"] or 0),
-            "chapter_index": int(row["chapter_index"] or 0),
-            "title": str(row["title"] or ""),
-            "ppt_filename": str(row["ppt_filename"] or "matched.pptx"),
-            "ppt_blob": bytes(row["ppt_blob"] or b""),
-            "source_filename": str(row["source_filename"] or ""),
-            "created_at": str(row["created_at"] or ""),
-            "score": score,
+        blobs = _fetch_ppt_blobs(conn, [row["id"] for row in rows]) if include_blob else {}
+
+    # 有命中的高分项在前，其余按最新记录补齐到 limit
+    return [
+        {
+            "chapter_id": row["id"],
+            "job_id": row["job_id"],
+            "chapter_index": row["chapter_index"],
+            "title": row["title"],
+            "ppt_filename": row["ppt_filename"] or "matched.pptx",
+            "ppt_blob": blobs.get(row["id"], b""),
+            # import_jobs 为 LEFT JOIN，任务记录缺失时为 NULL
+            "source_filename": row["source_filename"] if row["source_filename"] is not None else "",
+            "created_at": row["created_at"],
+            "score": row["score"],
         }
-        scored.append((score, int(row["id"]), item))
-
-    # 先取有命中的高分项，再用最新记录补齐到 limit
-    scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
-    chosen: list[dict[str, Any]] = []
-    used_ids: set[int] = set()
-    for score, _, item in scored:
-        if score <= 0:
-            continue
-        if item["chapter_id"] in used_ids:
-            continue
-        if not item["ppt_blob"]:
-            continue
-        used_ids.add(item["chapter_id"])
-        chosen.append(item)
-        if len(chosen) >= limit:
-            return chosen
+        for row in rows
+    ]
 
-    for _, _, item in scored:
-        if item["chapter_id"] in used_ids:
-            continue
-        if not item["ppt_blob"]:
-            continue
-        used_ids.add(item["chapter_id"])
-        chosen.append(item)
-        if len(chosen) >= limit:
-            break
-    return chosen
+
+def _fetch_ppt_blobs(conn: sqlite3.Connection, chapter_ids: list[int]) -> dict[int, bytes]:
+    if not chapter_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in chapter_ids)
+    return {
+        row["id"]: row["ppt_blob"]
+        for row in conn.execute(
+            f"""
+            SELECT c.id, b.data AS ppt_blob
+            FROM chapter_assets c
+            JOIN blob_store b ON b.hash = c.ppt_hash
+            WHERE c.id IN ({placeholders})
+            """,
+            tuple(chapter_ids),
+        )
+    }
 
 
 def save_session_record(
@@ -373,45 +646,38 @@ def save_session_record(
     visit_role: str,
     business_domains: list[str],
 ) -> dict[str, Any]:
-    init_db()
-    domains_text = "、".join([x.strip() for x in business_domains if x and x.strip()])
+    record = {
+        "raw_query": raw_query.strip(),
+        "generated_prompt": generated_prompt.strip(),
+        "industry": industry.strip(),
+        "customer": customer.strip(),
+        "duration": duration.strip(),
+        "product_name": product_name.strip(),
+        "visit_role": visit_role.strip(),
+        "business_domains": "、".join([x.strip() for x in business_domains if x and x.strip()]),
+        # 与列默认值 datetime('now') 同格式（UTC）；由此处写入，插入后无需再查询一次取回整行
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+    }
     with _connect() as conn:
         cur = conn.execute(
             """
             INSERT INTO session_records (
                 raw_query, generated_prompt, industry, customer, duration,
-                product_name, visit_role, business_domains
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                product_name, visit_role, business_domains, created_at
+            ) VALUES (
+                :raw_query, :generated_prompt, :industry, :customer, :duration,
+                :product_name, :visit_role, :business_domains, :created_at
+            )
             """,
-            (
-                raw_query.strip(),
-                generated_prompt.strip(),
-                industry.strip(),
-                customer.strip(),
-                duration.strip(),
-                product_name.strip(),
-                visit_role.strip(),
-                domains_text,
-            ),
+            record,
         )
-        conn.commit()
-        record_id = int(cur.lastrowid)
-        row = conn.execute(
-            """
-            SELECT id, raw_query, generated_prompt, industry, customer, duration,
-                   product_name, visit_role, business_domains, created_at
-            FROM session_records
-            WHERE id = ?
-            """,
-            (record_id,),
-        ).fetchone()
-    return dict(row)
+        _commit(conn, "session_records")
+    return {"id": cur.lastrowid, **record}
 
 
 def list_session_records(limit: int = 100) -> list[dict[str, Any]]:
-    init_db()
     with _connect() as conn:
-        rows = conn.execute(
+        cur = conn.execute(
             """
             SELECT id, raw_query, generated_prompt, industry, customer, duration,
                    product_name, visit_role, business_domains, created_at
@@ -420,39 +686,54 @@ def list_session_records(limit: int = 100) -> list[dict[str, Any]]:
             LIMIT ?
             """,
             (max(1, min(limit, 500)),),
-        ).fetchall()
-    return [dict(row) for row in rows]
+        )
+        cur.row_factory = None
+        rows = cur.fetchall()
+    return [
+        {
+            "id": r[0],
+            "raw_query": r[1],
+            "generated_prompt": r[2],
+            "industry": r[3],
+            "customer": r[4],
+            "duration": r[5],
+            "product_name": r[6],
+            "visit_role": r[7],
+            "business_domains": r[8],
+            "created_at": r[9],
+        }
+        for r in rows
+    ]
 
 
 def save_unified_template(*, filename: str, ppt_bytes: bytes) -> dict[str, Any]:
-    init_db()
+    ppt_hash = _blob_hash(ppt_bytes)
     with _connect() as conn:
+        _store_blobs(conn, {ppt_hash: ppt_bytes})
         cur = conn.execute(
-            "INSERT INTO unified_templates (filename, ppt_blob) VALUES (?, ?)",
-            (filename.strip() or "统一模板.pptx", sqlite3.Binary(ppt_bytes)),
+            "INSERT INTO unified_templates (filename, ppt_blob, ppt_hash, file_size) VALUES (?, X'', ?, ?)",
+            (filename.strip() or "统一模板.pptx", ppt_hash, len(ppt_bytes)),
         )
         template_id = int(cur.lastrowid)
         _set_active_template_id(conn, template_id)
-        conn.commit()
+        _commit(conn, "unified_templates", "app_settings")
         row = conn.execute(
-            """
-            SELECT id, filename, created_at, length(ppt_blob) AS file_size
-            FROM unified_templates
-            WHERE id = ?
+            f"""
+            {_TEMPLATE_META_SQL}
+            WHERE t.id = ?
             """,
             (template_id,),
         ).fetchone()
     return dict(row)
 
 
+@_cached_read("unified_templates")
 def get_latest_unified_template_meta() -> dict[str, Any] | None:
-    init_db()
     with _connect() as conn:
         row = conn.execute(
-            """
-            SELECT id, filename, created_at, length(ppt_blob) AS file_size
-            FROM unified_templates
-            ORDER BY id DESC
+            f"""
+            {_TEMPLATE_META_SQL}
+            ORDER BY t.id DESC
             LIMIT 1
             """
         ).fetchone()
@@ -460,79 +741,75 @@ def get_latest_unified_template_meta() -> dict[str, Any] | None:
 
 
 def get_latest_unified_template_blob() -> tuple[str, bytes] | None:
-    init_db()
     with _connect() as conn:
         row = conn.execute(
-            """
-            SELECT filename, ppt_blob
-            FROM unified_templates
-            ORDER BY id DESC
+            f"""
+            {_TEMPLATE_BLOB_SQL}
+            ORDER BY t.id DESC
             LIMIT 1
             """
         ).fetchone()
     if not row:
         return None
-    return str(row["filename"]), bytes(row["ppt_blob"] or b"")
+    return row["filename"], _template_blob(row)
 
 
+@_cached_read("unified_templates", "app_settings")
 def list_unified_templates(limit: int = 200) -> list[dict[str, Any]]:
-    init_db()
     with _connect() as conn:
         active_id = _get_active_template_id(conn)
-        rows = conn.execute(
-            """
-            SELECT id, filename, created_at, length(ppt_blob) AS file_size
-            FROM unified_templates
+        # 在最近 limit 条中，同名且同大小的模板仅保留最新一条
+        cur = conn.execute(
+            f"""
+            SELECT id, filename, created_at, file_size
+            FROM (
+                SELECT
+                    latest.*,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY filename, file_size ORDER BY id DESC
+                    ) AS rn
+                FROM ({_TEMPLATE_META_SQL} ORDER BY t.id DESC LIMIT ?) AS latest
+            )
+            WHERE rn = 1
             ORDER BY id DESC
-            LIMIT ?
             """,
             (max(1, min(limit, 1000)),),
-        ).fetchall()
-    # 同名且同大小的模板仅保留最新一条（按 id DESC 查询结果的首条）
-    seen_keys: set[tuple[str, int]] = set()
-    items: list[dict[str, Any]] = []
-    for row in rows:
-        item = dict(row)
-        key = (str(item.get("filename") or ""), int(item.get("file_size") or 0))
-        if key in seen_keys:
-            continue
-        seen_keys.add(key)
-        items.append(item)
-    for item in items:
-        item["is_active"] = active_id is not None and int(item["id"]) == int(active_id)
-    return items
+        )
+        cur.row_factory = None
+        rows = cur.fetchall()
+    return [
+        {"id": r[0], "filename": r[1], "created_at": r[2], "file_size": r[3], "is_active": r[0] == active_id}
+        for r in rows
+    ]
 
 
 def set_active_unified_template(template_id: int) -> dict[str, Any] | None:
-    init_db()
     with _connect() as conn:
         row = conn.execute(
-            """
-            SELECT id, filename, created_at, length(ppt_blob) AS file_size
-            FROM unified_templates
-            WHERE id = ?
+            f"""
+            {_TEMPLATE_META_SQL}
+            WHERE t.id = ?
             """,
             (template_id,),
         ).fetchone()
         if not row:
             return None
         _set_active_template_id(conn, template_id)
-        conn.commit()
+        _commit(conn, "app_settings")
     item = dict(row)
     item["is_active"] = True
     return item
 
 
+@_cached_read("unified_templates", "app_settings")
 def get_active_unified_template_meta() -> dict[str, Any] | None:
-    init_db()
     with _connect() as conn:
         active_id = _get_active_template_id(conn)
         if active_id is not None:
             row = conn.execute(
-                """
-                SELECT id, filename, created_at, length(ppt_blob) AS file_size
-                FROM unified_templates
-                WHERE id = ?
+                f"""
+                {_TEMPLATE_META_SQL}
+                WHERE t.id = ?
                 """,
                 (active_id,),
             ).fetchone()
@@ -541,59 +818,67 @@ def get_active_unified_template_meta() -> dict[str, Any] | None:
                 item["is_active"] = True
                 return item
         row = conn.execute(
-            """
-            SELECT id, filename, created_at, length(ppt_blob) AS file_size
-            FROM unified_templates
-            ORDER BY id DESC
+            f"""
+            {_TEMPLATE_META_SQL}
+            ORDER BY t.id DESC
             LIMIT 1
             """
         ).fetchone()
         if not row:
             return None
-        fallback_id = int(row["id"])
+        fallback_id = row["id"]
         _set_active_template_id(conn, fallback_id)
-        conn.commit()
+        _commit(conn, "app_settings")
         item = dict(row)
         item["is_active"] = True
         return item
 
 
 def get_active_unified_template_blob() -> tuple[int, str, bytes] | None:
-    init_db()
     with _connect() as conn:
         active_id = _get_active_template_id(conn)
         row = None
         if active_id is not None:
             row = conn.execute(
-                "SELECT id, filename, ppt_blob FROM unified_templates WHERE id = ?",
+                f"{_TEMPLATE_BLOB_SQL} WHERE t.id = ?",
                 (active_id,),
             ).fetchone()
         if not row:
             row = conn.execute(
-                "SELECT id, filename, ppt_blob FROM unified_templates ORDER BY id DESC LIMIT 1"
+                f"{_TEMPLATE_BLOB_SQL} ORDER BY t.id DESC LIMIT 1"
             ).fetchone()
             if row:
-                _set_active_template_id(conn, int(row["id"]))
-                conn.commit()
+                _set_active_template_id(conn, row["id"])
+                _commit(conn, "app_settings")
     if not row:
         return None
-    return int(row["id"]), str(row["filename"]), bytes(row["ppt_blob"] or b"")
+    return row["id"], row["filename"], _template_blob(row)
+
+
+def get_unified_template_meta(template_id: int) -> dict[str, Any] | None:
+    with _connect() as conn:
+        row = conn.execute(
+            f"""
+            {_TEMPLATE_META_SQL}
+            WHERE t.id = ?
+            """,
+            (template_id,),
+        ).fetchone()
+    return dict(row) if row else None
 
 
 def get_unified_template_blob_by_id(template_id: int) -> tuple[str, bytes] | None:
-    init_db()
     with _connect() as conn:
         row = conn.execute(
-            "SELECT filename, ppt_blob FROM unified_templates WHERE id = ?",
+            f"{_TEMPLATE_BLOB_SQL} WHERE t.id = ?",
             (template_id,),
         ).fetchone()
     if not row:
         return None
-    return str(row["filename"]), bytes(row["ppt_blob"] or b"")
+    return row["filename"], _template_blob(row)
 
 
 def delete_unified_template(template_id: int) -> dict[str, Any] | None:
-    init_db()
     with _connect() as conn:
         row = conn.execute("SELECT id FROM unified_templates WHERE id = ?", (template_id,)).fetchone()
         if not row:
@@ -604,11 +889,16 @@ def delete_unified_template(template_id: int) -> dict[str, Any] | None:
             "SELECT id FROM unified_templates ORDER BY id DESC LIMIT 1"
         ).fetchone()
         if next_row:
-            _set_active_template_id(conn, int(next_row["id"]))
+            _set_active_template_id(conn, next_row["id"])
         else:
             conn.execute("DELETE FROM app_settings WHERE key = 'active_unified_template_id'")
-        conn.commit()
-    return {"deleted_template_id": template_id, "next_active_template_id": int(next_row["id"]) if next_row else None}
+        _commit(conn, "unified_templates", "app_settings")
+    return {"deleted_template_id": template_id, "next_active_template_id": next_row["id"] if next_row else None}
+
+
+def _template_blob(row: sqlite3.Row) -> bytes:
+    # 模板内容经 LEFT JOIN blob_store 取得，内容缺失时为 NULL
+    return row["ppt_blob"] if row["ppt_blob"] is not None else b""
 
 
 def _get_active_template_id(conn: sqlite3.Connection) -> Optional[int]:
@@ -636,36 +926,54 @@ def _set_active_template_id(conn: sqlite3.Connection, template_id: int) -> None:
 
 def delete_job(job_id: int) -> bool:
     """删除整件文件（job）及其所有章节内容。"""
-    init_db()
     with _connect() as conn:
         exists = conn.execute("SELECT 1 FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
         if not exists:
             return False
         conn.execute("DELETE FROM chapter_assets WHERE job_id = ?", (job_id,))
         conn.execute("DELETE FROM import_jobs WHERE id = ?", (job_id,))
-        conn.commit()
+        _commit(conn, "import_jobs", "chapter_assets")
     return True
 
 
 def delete_chapter(chapter_id: int) -> dict[str, Any] | None:
-    """删除单章节，并同步更新所属 job 的章节数和 ZIP。"""
-    init_db()
-    with _connect() as conn:
-        row = conn.execute("SELECT id, job_id FROM chapter_assets WHERE id = ?", (chapter_id,)).fetchone()
-        if not row:
-            return None
-        job_id = int(row["job_id"])
-        conn.execute("DELETE FROM chapter_assets WHERE id = ?", (chapter_id,))
-        _rebuild_job_zip_and_count(conn, job_id)
-        conn.commit()
+    """删除单章节，并同步更新所属 job 的章节数；ZIP 标记为待重建。"""
+    result = delete_chapters([chapter_id])
+    return result[0] if result else None
 
-        left = conn.execute("SELECT chapter_count FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
-        chapter_count = int(left["chapter_count"]) if left else 0
-    return {"job_id": job_id, "chapter_count": chapter_count}
+
+def delete_chapters(chapter_ids: list[int]) -> list[dict[str, Any]]:
+    """
+    批量删除章节：一个事务内完成，每个受影响的 job 只重排一次章节序号。
+    ZIP 不在此处重建，只标记 zip_dirty，等到下载时再生成一次。
+    """
+    if not chapter_ids:
+        return []
+    placeholders = ", ".join("?" for _ in chapter_ids)
+    with _connect() as conn:
+        job_ids = [
+            row["job_id"]
+            for row in conn.execute(
+                f"SELECT DISTINCT job_id FROM chapter_assets WHERE id IN ({placeholders}) ORDER BY job_id",
+                tuple(chapter_ids),
+            )
+        ]
+        if not job_ids:
+            return []
+        conn.execute(f"DELETE FROM chapter_assets WHERE id IN ({placeholders})", tuple(chapter_ids))
+        result: list[dict[str, Any]] = []
+        for job_id in job_ids:
+            chapter_count = _renumber_chapters(conn, job_id)
+            conn.execute(
+                "UPDATE import_jobs SET chapter_count = ?, zip_dirty = 1 WHERE id = ?", (chapter_count, job_id)
+            )
+            result.append({"job_id": job_id, "chapter_count": chapter_count})
+        _commit(conn, "import_jobs", "chapter_assets")
+    return result
 
 
 def _safe_name(name: str) -> str:
-    cleaned = re.sub(r"[^\w\-\u4e00-\u9fff]+", "_", name or "")
+    cleaned = _UNSAFE_NAME_RE.sub("_", name or "")
     cleaned = cleaned.strip("_ ").strip()
     return (cleaned or "未命名章节")[:40]
 
@@ -679,6 +987,21 @@ def _build_md(*, title: str, summary: str, content: str, slide_count: int) -> st
     )
 
 
+def _chapter_fields(idx: int, chapter: dict[str, Any]) -> tuple[str, str, str, int]:
+    return (
+        str(chapter.get("title") or f"章节{idx}"),
+        str(chapter.get("summary") or ""),
+        str(chapter.get("content") or ""),
+        int(chapter.get("slide_count") or 0),
+    )
+
+
+def build_chapter_word_bytes(idx: int, chapter: dict[str, Any]) -> bytes:
+    """生成第 idx 个章节的 Word 文档（与 save_import_result 的默认生成一致），供调用方在写库事务之外预先生成。"""
+    title, summary, content, slide_count = _chapter_fields(idx, chapter)
+    return _build_word_bytes(title=title, summary=summary, content=content, slide_count=slide_count)
+
+
 def _build_word_bytes(*, title: str, summary: str, content: str, slide_count: int) -> bytes:
     try:
         from docx import Document
@@ -693,8 +1016,6 @@ def _build_word_bytes(*, title: str, summary: str, content: str, slide_count: in
     doc.add_paragraph(_xml_safe_text(summary) or "暂无摘要")
     doc.add_heading("章节正文", level=2)
     doc.add_paragraph(_xml_safe_text(content) or "暂无正文内容")
-    import io
-
     buf = io.BytesIO()
     doc.save(buf)
     return buf.getvalue()
@@ -712,43 +1033,129 @@ def _ensure_column(conn: sqlite3.Connection, table_name: str, column_name: str,
                 raise
 
 
-def _xml_safe_text(value: str | None) -> str:
-    text = value or ""
-    # XML 1.0 不允许控制字符（除 \t \n \r）
-    return "".join(ch for ch in text if ch == "\t" or ch == "\n" or ch == "\r" or ord(ch) >= 0x20)
+def _blob_hash(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
 
 
-def _rebuild_job_zip_and_count(conn: sqlite3.Connection, job_id: int) -> None:
-    """基于当前章节记录重建 zip_blob 与 chapter_count。"""
-    import io
-    import zipfile
+def _store_blobs(conn: sqlite3.Connection, blobs: dict[bytes, bytes]) -> None:
+    """按内容哈希写入 blob_store；已存在的内容不重复存储，引用计数由触发器维护。"""
+    conn.executemany(
+        "INSERT OR IGNORE INTO blob_store (hash, data) VALUES (?, ?)",
+        [(blob_hash, sqlite3.Binary(data)) for blob_hash, data in blobs.items()],
+    )
 
-    chapters = conn.execute(
+
+def _create_blob_store(conn: sqlite3.Connection) -> None:
+    """
+    PPT/Word/模板文件按内容去重存入 blob_store，业务表只保存 16 字节的 blake2b 哈希。
+    引用计数由触发器在增删改时维护，归零即回收。
+    """
+    conn.execute(
         """
-        SELECT id, chapter_index, ppt_filename, ppt_blob, md_filename, md_text, word_filename, word_blob
-        FROM chapter_assets
-        WHERE job_id = ?
-        ORDER BY chapter_index ASC, id ASC
-        """,
+        CREATE TABLE IF NOT EXISTS blob_store (
+            hash BLOB PRIMARY KEY,
+            data BLOB NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    _ensure_column(conn, "chapter_assets", "ppt_hash", "BLOB REFERENCES blob_store(hash)")
+    _ensure_column(conn, "chapter_assets", "word_hash", "BLOB REFERENCES blob_store(hash)")
+    _ensure_column(conn, "unified_templates", "ppt_hash", "BLOB REFERENCES blob_store(hash)")
+    for table, hash_cols in (("chapter_assets", ("ppt_hash", "word_hash")), ("unified_templates", ("ppt_hash",))):
+        incr = "".join(f"UPDATE blob_store SET refcount = refcount + 1 WHERE hash = NEW.{col};" for col in hash_cols)
+        decr = "".join(f"UPDATE blob_store SET refcount = refcount - 1 WHERE hash = OLD.{col};" for col in hash_cols)
+        old_hashes = ", ".join(f"OLD.{col}" for col in hash_cols)
+        gc = f"DELETE FROM blob_store WHERE refcount <= 0 AND hash IN ({old_hashes});"
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_insert AFTER INSERT ON {table} BEGIN {incr} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_delete AFTER DELETE ON {table} BEGIN {decr} {gc} END")
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_update AFTER UPDATE OF {', '.join(hash_cols)} ON {table} "
+            f"BEGIN {incr} {decr} {gc} END"
+        )
+    _migrate_blobs_to_store(conn)
+
+
+def _migrate_blobs_to_store(conn: sqlite3.Connection) -> None:
+    """把旧版本行内的文件内容迁入 blob_store（只处理尚无哈希的行，迁移完成后即不再命中）。"""
+    for table, blob_col, hash_col in (
+        ("chapter_assets", "ppt_blob", "ppt_hash"),
+        ("chapter_assets", "word_blob", "word_hash"),
+        ("unified_templates", "ppt_blob", "ppt_hash"),
+    ):
+        ids = [
+            row[0]
+            for row in conn.execute(f"SELECT id FROM {table} WHERE {hash_col} IS NULL AND {blob_col} IS NOT NULL")
+        ]
+        # 逐行读取，内存中同时只保留一个文件
+        for row_id in ids:
+            data = bytes(conn.execute(f"SELECT {blob_col} FROM {table} WHERE id = ?", (row_id,)).fetchone()[0])
+            blob_hash = _blob_hash(data)
+            _store_blobs(conn, {blob_hash: data})
+            conn.execute(f"UPDATE {table} SET {hash_col} = ?, {blob_col} = X'' WHERE id = ?", (blob_hash, row_id))
+
+
+def _xml_safe_text(value: str | None) -> str:
+    # XML 1.0 不允许控制字符（除 \t \n \r）；translate 在 C 层逐字符删除
+    return (value or "").translate(_XML_UNSAFE_CHARS)
+
+
+def _renumber_chapters(conn: sqlite3.Connection, job_id: int) -> int:
+    """重排章节序号，保持连续（1..N），返回剩余章节数。"""
+    chapters = conn.execute(
+        "SELECT id, chapter_index FROM chapter_assets WHERE job_id = ? ORDER BY chapter_index ASC, id ASC",
         (job_id,),
     ).fetchall()
-
-    # 重排章节序号，保持连续（1..N）
     for new_idx, ch in enumerate(chapters, start=1):
-        if int(ch["chapter_index"]) != new_idx:
-            conn.execute("UPDATE chapter_assets SET chapter_index = ? WHERE id = ?", (new_idx, int(ch["id"])))
+        if ch["chapter_index"] != new_idx:
+            conn.execute("UPDATE chapter_assets SET chapter_index = ? WHERE id = ?", (new_idx, ch["id"]))
+    return len(chapters)
+
+
+def _ensure_job_zip(job_id: int) -> None:
+    """删除章节后 ZIP 被标记为待重建，下载前在写事务中按需重建一次。"""
+    with _connect() as conn:
+        row = conn.execute("SELECT zip_dirty FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row or not row["zip_dirty"]:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        # 拿到写锁后再确认一次：并发下载时只需一个请求重建
+        row = conn.execute("SELECT zip_dirty FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row and row["zip_dirty"]:
+            _rebuild_job_zip(conn, job_id)
+        _commit(conn, "import_jobs")
+
+
+def _rebuild_job_zip(conn: sqlite3.Connection, job_id: int) -> None:
+    """基于当前章节记录重建 zip_blob，并清除 zip_dirty 标记。"""
+    import zipfile
 
     buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for ch in chapters:
+    # 逐行读取并写入，内存中同时只保留一个章节的 BLOB（不再 fetchall 全部文件）。
+    # pptx/docx 本身已是压缩包，直接存储；仅 md 文本再压缩
+    rows = conn.execute(
+        """
+        SELECT c.ppt_filename, p.data AS ppt_blob, c.md_filename, c.md_text, c.word_filename, w.data AS word_blob
+        FROM chapter_assets c
+        LEFT JOIN blob_store p ON p.hash = c.ppt_hash
+        LEFT JOIN blob_store w ON w.hash = c.word_hash
+        WHERE c.job_id = ?
+        ORDER BY c.chapter_index ASC, c.id ASC
+        """,
+        (job_id,),
+    )
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        for ch in rows:
             if ch["ppt_filename"] and ch["ppt_blob"] is not None:
-                zf.writestr(str(ch["ppt_filename"]), bytes(ch["ppt_blob"]))
+                zf.writestr(str(ch["ppt_filename"]), ch["ppt_blob"])
             if ch["md_filename"] and ch["md_text"] is not None:
-                zf.writestr(str(ch["md_filename"]), str(ch["md_text"]).encode("utf-8"))
+                zf.writestr(
+                    str(ch["md_filename"]),
+                    str(ch["md_text"]).encode("utf-8"),
+                    compress_type=zipfile.ZIP_DEFLATED,
+                )
             if ch["word_filename"] and ch["word_blob"] is not None:
-                zf.writestr(str(ch["word_filename"]), bytes(ch["word_blob"]))
+                zf.writestr(str(ch["word_filename"]), ch["word_blob"])
 
-    conn.execute(
-        "UPDATE import_jobs SET chapter_count = ?, zip_blob = ? WHERE id = ?",
-        (len(chapters), sqlite3.Binary(buf.getvalue()), job_id),
-    )
+    # getbuffer() 直接绑定缓冲区，省去 getvalue() 的整份拷贝
+    conn.execute("UPDATE import_jobs SET zip_blob = ?, zip_dirty = 0 WHERE id = ?", (buf.getbuffer(), job_id))
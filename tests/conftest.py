@@ -1,6 +1,31 @@
 import sys
+import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+from app import storage  # noqa: E402
+
+# app.main 导入时即调用 init_db()：须在任何测试模块导入它之前把库指向临时目录，
+# 避免测试写入仓库中的 data/ppt_mvp.db
+storage.DB_DIR = Path(tempfile.mkdtemp(prefix="ppt_agent_test_db_"))
+storage.DB_PATH = storage.DB_DIR / "ppt_mvp.db"
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    """每个测试使用独立的 SQLite 库：重置建表标记、线程连接和读缓存。"""
+    monkeypatch.setattr(storage, "DB_DIR", tmp_path)
+    monkeypatch.setattr(storage, "DB_PATH", tmp_path / "ppt_mvp.db")
+    monkeypatch.setattr(storage, "_SCHEMA_READY", False)
+    monkeypatch.setattr(storage, "_LOCAL", threading.local())
+    monkeypatch.setattr(storage, "_READ_CACHE", OrderedDict())
+    if "app.main" in sys.modules:
+        # 统一模板按 id 落盘缓存，新库的 id 会从 1 重新开始
+        monkeypatch.setattr(sys.modules["app.main"], "_TEMPLATE_CACHE_DIR", tmp_path / "templates")
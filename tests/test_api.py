@@ -1,9 +1,25 @@
+import io
+import sqlite3
+import zipfile
 from pathlib import Path
 
 from fastapi.testclient import TestClient
 from pptx import Presentation
 
+from app import main, research, storage
 from app.main import app
+from app.storage import (
+    delete_chapter,
+    delete_unified_template,
+    get_db_info,
+    list_import_jobs,
+    list_unified_templates,
+    open_chapter_file_stream,
+    save_import_result,
+    save_unified_template,
+)
+
+_PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
 
 
 def _create_ppt(path: Path, title: str) -> None:
@@ -13,6 +29,19 @@ def _create_ppt(path: Path, title: str) -> None:
     prs.save(str(path))
 
 
+def _create_chaptered_ppt(path: Path, titles: list[str]) -> None:
+    prs = Presentation()
+    for title in titles:
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        slide.shapes.add_textbox(300000, 300000, 4000000, 600000).text = title
+    prs.save(str(path))
+
+
+def _blob_store_rows() -> int:
+    with storage._connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM blob_store").fetchone()[0]
+
+
 def test_merge_endpoint(tmp_path: Path):
     template_path = tmp_path / "template.pptx"
     source1_path = tmp_path / "source1.pptx"
@@ -36,3 +65,297 @@ def test_merge_endpoint(tmp_path: Path):
     assert response.headers["content-type"] == "application/vnd.openxmlformats-officedocument.presentationml.presentation"
     assert int(response.headers["x-merge-imported-slides"]) == 2
     assert response.content[:2] == b"PK"
+    # 直接从磁盘回传文件，发送完毕后临时目录即被清理
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert [p for p in main._SCRATCH_ROOT.iterdir() if p != main._TEMPLATE_CACHE_DIR] == []
+
+
+def test_ppt_import_returns_download_urls(tmp_path: Path):
+    source_path = tmp_path / "import.pptx"
+    _create_ppt(source_path, "01 公司介绍")
+
+    client = TestClient(app)
+    with source_path.open("rb") as source_f:
+        response = client.post(
+            "/ppt-import",
+            files=[("files", ("import.pptx", source_f, "application/vnd.openxmlformats-officedocument.presentationml.presentation"))],
+        )
+
+    assert response.status_code == 200
+    item = response.json()["items"][0]
+    assert "zip_base64" not in item
+    assert item["zip_url"].endswith(f"/jobs/{item['db_info']['saved_job_id']}/zip")
+    chapter = item["chapters"][0]
+    assert "ppt_base64" not in chapter
+
+    ppt_resp = client.get(chapter["ppt_url"])
+    assert ppt_resp.status_code == 200
+    assert ppt_resp.content[:2] == b"PK"
+    zip_resp = client.get(item["zip_url"])
+    assert zip_resp.status_code == 200
+    assert zip_resp.content[:2] == b"PK"
+
+
+def test_ppt_import_rejects_non_zip_upload():
+    client = TestClient(app)
+    response = client.post(
+        "/ppt-import",
+        files=[("files", ("fake.pptx", b"not a pptx", "application/vnd.openxmlformats-officedocument.presentationml.presentation"))],
+    )
+
+    assert response.status_code == 400
+    assert "不是有效的 .pptx" in response.json()["detail"]
+
+
+def test_ppt_import_saves_in_upload_order_and_nothing_on_failure(tmp_path: Path):
+    paths = []
+    for name in ("a", "b"):
+        path = tmp_path / f"{name}.pptx"
+        _create_ppt(path, f"01 {name}")
+        paths.append(path)
+
+    client = TestClient(app)
+    response = client.post(
+        "/ppt-import",
+        files=[("files", (p.name, p.read_bytes(), _PPTX_MEDIA_TYPE)) for p in paths],
+    )
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["source_filename"] for item in items] == ["a.pptx", "b.pptx"]
+    assert items[0]["db_info"]["saved_job_id"] < items[1]["db_info"]["saved_job_id"]
+
+    # 通过了 ZIP 魔数校验但无法解析：整批返回 400，且已成功拆分的文件也不入库
+    jobs_before = len(list_import_jobs())
+    response = client.post(
+        "/ppt-import",
+        files=[
+            ("files", ("a.pptx", paths[0].read_bytes(), _PPTX_MEDIA_TYPE)),
+            ("files", ("broken.pptx", b"PK\x03\x04broken", _PPTX_MEDIA_TYPE)),
+        ],
+    )
+    assert response.status_code == 400
+    assert "broken.pptx" in response.json()["detail"]
+    assert len(list_import_jobs()) == jobs_before
+
+
+def test_delete_chapter_renumbers_and_rebuilds_zip(tmp_path: Path):
+    source_path = tmp_path / "deck.pptx"
+    _create_chaptered_ppt(source_path, ["01 公司介绍", "02 产品方案", "03 成功案例"])
+
+    client = TestClient(app)
+    response = client.post("/ppt-import", files=[("files", ("deck.pptx", source_path.read_bytes(), _PPTX_MEDIA_TYPE))])
+    assert response.status_code == 200
+    item = response.json()["items"][0]
+    job_id = item["db_info"]["saved_job_id"]
+    chapters = client.get(f"/api/practice-library/jobs/{job_id}").json()["chapters"]
+    assert [c["chapter_index"] for c in chapters] == [1, 2, 3]
+
+    deleted = client.delete(f"/api/practice-library/chapters/{chapters[1]['id']}")
+    assert deleted.json() == {"ok": True, "job_id": job_id, "chapter_count": 2}
+
+    # 删除后序号连续，ZIP 在下载时按剩余章节重建
+    detail = client.get(f"/api/practice-library/jobs/{job_id}").json()
+    assert detail["job"]["chapter_count"] == 2
+    assert [(c["chapter_index"], c["id"]) for c in detail["chapters"]] == [(1, chapters[0]["id"]), (2, chapters[2]["id"])]
+    zip_resp = client.get(item["zip_url"])
+    assert zip_resp.status_code == 200
+    names = zipfile.ZipFile(io.BytesIO(zip_resp.content)).namelist()
+    assert names == [
+        name for c in detail["chapters"] for name in (c["ppt_filename"], c["md_filename"], c["word_filename"])
+    ]
+
+
+def test_blob_store_keeps_shared_blobs_until_last_reference():
+    shared_ppt = b"shared-ppt"
+    first = save_import_result(
+        source_filename="a.pptx",
+        chapters=[
+            {"title": "共享", "ppt_bytes": shared_ppt, "word_bytes": b"word-a1"},
+            {"title": "独有", "ppt_bytes": b"only-a2", "word_bytes": b"word-a2"},
+        ],
+        zip_bytes=b"zip-a",
+    )
+    second = save_import_result(
+        source_filename="b.pptx",
+        chapters=[{"title": "共享", "ppt_bytes": shared_ppt, "word_bytes": b"word-b1"}],
+        zip_bytes=b"zip-b",
+    )
+    # 相同内容只存一份
+    assert _blob_store_rows() == 5
+
+    # 删除引用共享 PPT 的一个章节：只回收其独有的 Word，共享 PPT 仍被另一章节引用
+    delete_chapter(first["chapter_ids"][0])
+    assert _blob_store_rows() == 4
+    _, _, chunks, _ = open_chapter_file_stream(second["chapter_ids"][0], "ppt")
+    assert b"".join(chunks) == shared_ppt
+
+    # 删除不共享内容的章节：PPT 与 Word 一并回收
+    delete_chapter(first["chapter_ids"][1])
+    assert _blob_store_rows() == 2
+
+    delete_chapter(second["chapter_ids"][0])
+    assert _blob_store_rows() == 0
+
+
+def test_legacy_inline_blobs_are_migrated_to_blob_store():
+    storage.DB_DIR.mkdir(parents=True, exist_ok=True)
+    legacy = sqlite3.connect(storage.DB_PATH)
+    legacy.executescript(
+        """
+        CREATE TABLE import_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_filename TEXT NOT NULL,
+            chapter_count INTEGER NOT NULL,
+            zip_filename TEXT NOT NULL,
+            zip_blob BLOB NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        CREATE TABLE chapter_assets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            chapter_index INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            content TEXT NOT NULL,
+            slide_count INTEGER NOT NULL,
+            ppt_filename TEXT NOT NULL,
+            ppt_blob BLOB NOT NULL,
+            md_filename TEXT NOT NULL,
+            md_text TEXT NOT NULL,
+            word_filename TEXT,
+            word_blob BLOB,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        INSERT INTO import_jobs (source_filename, chapter_count, zip_filename, zip_blob) VALUES ('old.pptx', 1, 'old.zip', X'00');
+        INSERT INTO chapter_assets (
+            job_id, chapter_index, title, summary, content, slide_count,
+            ppt_filename, ppt_blob, md_filename, md_text, word_filename, word_blob
+        ) VALUES (1, 1, '旧章节', '', '', 1, 'old.pptx', X'6F6C642D707074', 'old.md', '# 旧章节', 'old.docx', X'6F6C642D776F7264');
+        """
+    )
+    legacy.commit()
+    legacy.close()
+
+    _, size, chunks, _ = open_chapter_file_stream(1, "ppt")
+    assert (size, b"".join(chunks)) == (7, b"old-ppt")
+    _, _, chunks, _ = open_chapter_file_stream(1, "word")
+    assert b"".join(chunks) == b"old-word"
+    with storage._connect() as conn:
+        row = conn.execute("SELECT ppt_blob, word_blob, ppt_size FROM chapter_assets WHERE id = 1").fetchone()
+    # 行内内容已清空，长度回填，文件只存在 blob_store 中
+    assert (bytes(row["ppt_blob"]), bytes(row["word_blob"]), row["ppt_size"]) == (b"", b"", 7)
+    assert _blob_store_rows() == 2
+
+
+def test_cached_reads_are_invalidated_by_writes():
+    assert list_unified_templates() == []
+    counts = {t["name"]: t["rows"] for t in get_db_info()["tables"]}
+    assert counts["unified_templates"] == 0
+
+    saved = save_unified_template(filename="统一模板.pptx", ppt_bytes=b"template")
+    assert [t["id"] for t in list_unified_templates()] == [saved["id"]]
+    counts = {t["name"]: t["rows"] for t in get_db_info()["tables"]}
+    assert (counts["unified_templates"], counts["blob_store"]) == (1, 1)
+
+    delete_unified_template(saved["id"])
+    assert list_unified_templates() == []
+
+    # 其他连接（如另一个 worker 进程）的写入同样使缓存失效
+    other = sqlite3.connect(storage.DB_PATH)
+    other.execute("INSERT INTO app_settings (key, value) VALUES ('k', 'v')")
+    other.commit()
+    other.close()
+    counts = {t["name"]: t["rows"] for t in get_db_info()["tables"]}
+    assert (counts["unified_templates"], counts["app_settings"]) == (0, 1)
+
+    # 重复导入同一模板后，列表只保留最新的一条
+    save_unified_template(filename="统一模板.pptx", ppt_bytes=b"template")
+    latest = save_unified_template(filename="统一模板.pptx", ppt_bytes=b"template")
+    assert [t["id"] for t in list_unified_templates()] == [latest["id"]]
+
+
+def test_merge_uses_cached_unified_template(tmp_path: Path):
+    template_path = tmp_path / "unified.pptx"
+    source_path = tmp_path / "source.pptx"
+    _create_ppt(template_path, "统一模板")
+    _create_ppt(source_path, "内容")
+
+    client = TestClient(app)
+    with template_path.open("rb") as template_f:
+        upload = client.post(
+            "/api/practice-library/unified-template",
+            files=[("template", ("unified.pptx", template_f, "application/vnd.openxmlformats-officedocument.presentationml.presentation"))],
+        )
+    assert upload.status_code == 200
+
+    for _ in range(2):
+        with source_path.open("rb") as source_f:
+            response = client.post(
+                "/merge",
+                files=[("sources", ("source.pptx", source_f, "application/vnd.openxmlformats-officedocument.presentationml.presentation"))],
+            )
+        assert response.status_code == 200
+        assert response.headers["x-template-source"] == "unified_db"
+        assert int(response.headers["x-merge-imported-slides"]) == 1
+
+
+def test_download_unified_template(tmp_path: Path):
+    template_path = tmp_path / "unified.pptx"
+    _create_ppt(template_path, "统一模板")
+
+    client = TestClient(app)
+    with template_path.open("rb") as template_f:
+        upload = client.post(
+            "/api/practice-library/unified-template",
+            files=[("template", ("unified.pptx", template_f, "application/vnd.openxmlformats-officedocument.presentationml.presentation"))],
+        )
+    template_id = upload.json()["item"]["id"]
+
+    response = client.get(f"/api/practice-library/unified-template/download?template_id={template_id}")
+    assert response.status_code == 200
+    assert response.content == template_path.read_bytes()
+
+
+def test_search_fill_without_template_skips_research(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "research_industry_and_customer", lambda *args, **kwargs: calls.append(args))
+
+    client = TestClient(app)
+    response = client.post("/search-fill", data={"industry": "制造", "customer": "某公司"})
+
+    assert response.status_code == 400
+    assert "统一模板" in response.json()["detail"]
+    assert calls == []
+
+
+def test_write_env_values_keeps_file_mode(tmp_path: Path, monkeypatch):
+    env_path = tmp_path / ".env"
+    env_path.write_text("# comment\nDEEPSEEK_API_KEY='old'\n", encoding="utf-8")
+    env_path.chmod(0o600)
+    monkeypatch.setattr(main, "ENV_PATH", env_path)
+
+    main._write_env_values({"DEEPSEEK_API_KEY": "new", "DEEPSEEK_MODEL": "deepseek-chat"})
+
+    assert env_path.stat().st_mode & 0o777 == 0o600
+    assert env_path.read_text(encoding="utf-8") == "# comment\nDEEPSEEK_API_KEY='new'\nDEEPSEEK_MODEL='deepseek-chat'\n"
+    assert [p.name for p in tmp_path.iterdir()] == [".env"]
+
+
+def test_settings_share_research_config(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(main, "ENV_PATH", tmp_path / ".env")
+    for key in ("DEEPSEEK_API_KEY", "DEEPSEEK_BASE_URL", "DEEPSEEK_MODEL", "DEEPSEEK_TIMEOUT_SECONDS"):
+        monkeypatch.setenv(key, "")
+    monkeypatch.setattr(research, "_CFG", research.current_config())
+
+    client = TestClient(app)
+    response = client.post(
+        "/api/settings",
+        data={"deepseek_api_key": "sk-test-123456", "deepseek_model": "deepseek-reasoner", "deepseek_timeout_seconds": "30"},
+    )
+    assert response.status_code == 200
+
+    settings = client.get("/api/settings").json()
+    cfg = research.current_config()
+    assert (cfg.api_key, cfg.model, cfg.timeout_seconds) == ("sk-test-123456", "deepseek-reasoner", 30.0)
+    assert settings["masked_api_key"] == response.json()["masked_api_key"]
+    assert (settings["deepseek_model"], settings["deepseek_timeout_seconds"]) == ("deepseek-reasoner", "30")
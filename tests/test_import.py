@@ -0,0 +1,23 @@
+from pptx import Presentation
+
+from app.ppt_import import extract_all_text
+
+
+def test_extract_all_text_splits_title_and_body():
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "01 公司介绍"
+    slide.placeholders[1].text = "要点一\n要点二"
+    slide.shapes.add_textbox(300000, 300000, 4000000, 600000).text = "这是一段较长的正文说明" * 10
+
+    blank = prs.slides.add_slide(prs.slide_layouts[6])
+    blank.shapes.add_textbox(300000, 300000, 4000000, 600000).text = "  短标题  "
+
+    first, second = extract_all_text(prs)
+
+    assert first.title == "01 公司介绍"
+    assert first.body == "要点一\n要点二\n" + "这是一段较长的正文说明" * 10
+    assert second.title == "短标题"
+    assert second.body == ""
+    assert first.full_len == len(first.full_text)
+    assert second.full_text == "短标题"
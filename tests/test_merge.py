@@ -43,3 +43,25 @@ def test_merge_with_template(tmp_path: Path):
     assert report.total_source_files == 1
     assert report.total_source_slides == 2
     assert report.imported_slides == 2
+
+
+def test_merge_rescales_wide_source_and_skips_shapes_without_geometry(tmp_path: Path):
+    template = tmp_path / "template.pptx"
+    source = tmp_path / "wide.pptx"
+    output = tmp_path / "output.pptx"
+    _build_template(template)
+
+    prs = Presentation()
+    prs.slide_width, prs.slide_height = 12192000, 6858000
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "宽屏标题"
+    # 正文占位符没有自己的 xfrm，脱离版式后没有可缩放的几何信息
+    slide.placeholders[1].text_frame.text = "正文"
+    slide.shapes.add_textbox(1219200, 685800, 6096000, 1371600).text = "文本框"
+    prs.save(str(source))
+
+    report = merge_with_template(template, [source], output)
+
+    assert report.layout_adjusted_slides == 1
+    textbox = Presentation(str(output)).slides[1].shapes[-1]
+    assert (textbox.left, textbox.top, textbox.width, textbox.height) == (914400, 685800, 4572000, 1371600)